@@ -0,0 +1,213 @@
+"""Micro- and macro-benchmarks for the game engine.
+
+Run with `python -m src.benchmarks`. Each benchmark times one operation with timeit, taking the best of several
+repeats, and reports microseconds per call. The micro-benchmarks time the hot paths on fixed inputs: the round 1
+victory check over a corpus of seeded hands, choosing a discard, auto-melding and setting up a game. The
+macro-benchmarks play whole headless games.
+
+Timings are compared with a baseline file, benchmarks_baseline.json, committed alongside this module. `--save` records
+the current timings as the baseline, and `--check` exits with an error if any benchmark is slower than its baseline by
+more than the threshold. Baselines are only comparable on the machine that recorded them, so record one before
+touching a hot path and check against it afterwards.
+
+The committed baseline is a regression baseline only. It was recorded on the optimized engine, not on the original
+game, which predates the headless, seeded games these benchmarks play, so it can't show how much faster the engine
+got. It shows whether a later change makes it slower.
+"""
+import argparse
+import copy
+import io
+import json
+import os
+import random
+import sys
+import timeit
+from contextlib import redirect_stdout
+from functools import lru_cache
+
+import pydealer
+
+from src.discard import discard_scores
+from src.main import Game, Hand, AIPlayer, VictoryConditions, decode_cards
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks_baseline.json")
+# how much slower than its baseline a benchmark can be before it's a regression
+THRESHOLD = 0.25
+CORPUS_SIZE = 256
+GAME_SEEDS = range(10)
+
+
+def mutate(game):
+    """A typical lookahead step: the seat to move draws, melds or goes down if it can, and discards."""
+    seat_index = game.turns % len(game.seats)
+    seat = game.seats[seat_index]
+    game.turns += 1
+    game.opponents_turn(seat_index, seat)
+    game.check_for_winner(seat)
+
+
+def midgame(seed=0, turns=20):
+    game = Game(headless=True, seed=seed)
+    game.play_headless(max_turns=turns)
+    return game
+
+
+@lru_cache(maxsize=None)
+def hand_corpus(seed=0, size=CORPUS_SIZE):
+    """Seeded random hands, alternately of 11 cards and of the 12 held after drawing. About a quarter can go down in
+    round 1."""
+    rng = random.Random(seed)
+    return tuple(Hand(cards=decode_cards(rng.sample(range(104), 11 + hand_number % 2)))
+                 for hand_number in range(size))
+
+
+@lru_cache(maxsize=None)
+def melding_game(seed=0):
+    """A game in which another seat has gone down, and the player holds a card that melds into the down cards."""
+    game = Game(headless=True, seed=seed, player_input=AIPlayer())
+    while game.playing:
+        mutate(game)
+        if game.turns % len(game.seats) and any(game.hand.counts[rank] for rank in game.meld_index.groups if rank):
+            return game
+    raise ValueError(f"Nothing to meld in game {seed}.")
+
+
+def bench_clone(game):
+    mutate(game.clone())
+
+
+def bench_deepcopy(game):
+    mutate(copy.deepcopy(game))
+
+
+def bench_snapshot_restore(game):
+    snapshot = game.snapshot()
+    mutate(game)
+    game.restore(snapshot)
+
+
+def bench_discard_scores(game):
+    discard_scores(game, game.player)
+
+
+def bench_two_three_of_a_kind(game):
+    victory_cards = pydealer.Stack()
+    for hand in hand_corpus():
+        VictoryConditions.two_three_of_a_kind(hand, victory_cards)
+
+
+def bench_discard_choices(game):
+    for seat in game.seats:
+        game.get_discard_choices(seat)
+
+
+def bench_discard_choice(game):
+    # the choice get_discard_choice makes, without discarding
+    for seat in game.seats:
+        seat.policy.discard_index(game, seat)
+
+
+def bench_auto_meld(game):
+    # meld_prompt prints what it melds, and changes the game, so it's played on a snapshot of a game set up for it
+    melding = melding_game()
+    snapshot = melding.snapshot()
+    with redirect_stdout(io.StringIO()):
+        melding.meld_prompt()
+    melding.restore(snapshot)
+
+
+def bench_setup(game):
+    Game(headless=True, seed=0)
+
+
+def bench_headless_games(game):
+    for seed in GAME_SEEDS:
+        Game(headless=True, seed=seed).play_headless()
+
+
+BENCHMARKS = {
+    "clone + mutate": bench_clone,
+    "deepcopy + mutate": bench_deepcopy,
+    "snapshot + mutate + restore": bench_snapshot_restore,
+    "discard scores": bench_discard_scores,
+    f"two_three_of_a_kind x {CORPUS_SIZE}": bench_two_three_of_a_kind,
+    "get_discard_choices x 5": bench_discard_choices,
+    "get_discard_choice x 5": bench_discard_choice,
+    "meld_prompt auto-meld": bench_auto_meld,
+    "Game setup": bench_setup,
+}
+# these are slow enough to time a few calls at a time
+MACRO_BENCHMARKS = {
+    f"headless games x {len(GAME_SEEDS)}": bench_headless_games,
+}
+
+
+def time_benchmark(benchmark, game, number, repeat=5):
+    """Returns the best time per call of benchmark(game), in microseconds."""
+    return min(timeit.repeat(lambda: benchmark(game), number=number, repeat=repeat)) / number * 1e6
+
+
+def run_benchmarks(game, number, macro_number, repeat=5):
+    """Times every benchmark, returning microseconds per call by name."""
+    timings = {name: time_benchmark(benchmark, game, number, repeat) for name, benchmark in BENCHMARKS.items()}
+    timings.update((name, time_benchmark(benchmark, game, macro_number, repeat))
+                   for name, benchmark in MACRO_BENCHMARKS.items())
+    return timings
+
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(timings, path=BASELINE_PATH):
+    with open(path, "w") as baseline_file:
+        json.dump({name: round(microseconds, 2) for name, microseconds in timings.items()}, baseline_file, indent=2)
+        baseline_file.write("\n")
+
+
+def regressions(timings, baseline, threshold=THRESHOLD):
+    """The benchmarks more than threshold (a fraction) slower than their baselines. Benchmarks without a baseline
+    can't regress."""
+    return [name for name, microseconds in timings.items()
+            if name in baseline and microseconds > baseline[name] * (1 + threshold)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the engine's hot paths and whole headless games, comparing "
+                                                 "them with a baseline.")
+    parser.add_argument("--number", type=int, default=200, help="calls per repeat")
+    parser.add_argument("--macro-number", type=int, default=3, help="calls per repeat of the macro-benchmarks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="record these timings as the baseline")
+    parser.add_argument("--check", action="store_true", help="fail if any benchmark regressed")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="the slowdown, as a fraction of the baseline, that counts as a regression")
+    args = parser.parse_args()
+
+    game = midgame(args.seed)
+    timings = run_benchmarks(game, args.number, args.macro_number)
+    baseline = load_baseline(args.baseline) if os.path.exists(args.baseline) else {}
+    for name, microseconds in timings.items():
+        line = f"{name:30} {microseconds:12.1f} µs"
+        if name in baseline:
+            line += f" {baseline[name]:12.1f} µs baseline {microseconds / baseline[name] - 1:+7.1%}"
+        print(line)
+    print(f"\n{len(GAME_SEEDS) * 1e6 / timings[f'headless games x {len(GAME_SEEDS)}']:.1f} headless games/s")
+    deepcopy_time = timings["deepcopy + mutate"]
+    print(f"clone is {deepcopy_time / timings['clone + mutate']:.1f}x and snapshot/restore "
+          f"{deepcopy_time / timings['snapshot + mutate + restore']:.1f}x faster than deepcopy")
+
+    if args.save:
+        save_baseline(timings, args.baseline)
+        print(f"Saved the baseline to {args.baseline}.")
+    if args.check:
+        regressed = regressions(timings, baseline, args.threshold)
+        if regressed:
+            print(f"Regressions of more than {args.threshold:.0%}: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""A compact binary format for game states, to checkpoint and resume games and to pass positions between processes.
+
+A checkpoint is a packed Game.snapshot(). Version 3 is laid out as, in little-endian order:
+
+    header  magic, version (uint16), round, dealer seat, turns (uint32), playing, winner seat (255 for none), seat
+            count, deck size, discard pile size, meld group count and meld sequence count (one byte each)
+    seats   per seat: down flag, hand size, victory card count, down card count and "May I" claims made this round
+            (one byte each), then its match score (uint16)
+    cards   the deck (bottom to top), the discard pile, then per seat the hand, victory cards and down cards, as one
+            card code per byte
+    melds   per three of a kind, in the meld index's order: rank, owning seat; then per sequence: owning seat, suit,
+            low and high positions
+
+The random number generator's state isn't saved, so a resumed game reshuffles with the seed it's loaded with.
+"""
+import struct
+
+from src.main import Game, GameSnapshot, SeatSnapshot, encode_cards, decode_cards
+
+MAGIC = b"MAYG"
+VERSION = 3
+HEADER = struct.Struct("<4sHBBIBBBBBBB")
+SEAT = struct.Struct("<BBBBBH")
+NO_WINNER = 255
+
+
+def pack_snapshot(snapshot):
+    meld_groups = bytes(field for rank, owners in snapshot.meld_groups for seat_index in owners
+                        for field in (rank, seat_index))
+    meld_sequences = bytes(field for sequence in snapshot.meld_sequences for field in sequence)
+    parts = [HEADER.pack(MAGIC, VERSION, snapshot.round, snapshot.dealer, snapshot.turns, snapshot.playing,
+                         NO_WINNER if snapshot.winner is None else snapshot.winner, len(snapshot.seats),
+                         len(snapshot.deck), len(snapshot.discard_pile), len(meld_groups) // 2,
+                         len(snapshot.meld_sequences))]
+    parts.extend(SEAT.pack(seat.down, len(seat.hand), len(seat.victory_cards), len(seat.down_cards), seat.claims,
+                           score) for seat, score in zip(snapshot.seats, snapshot.scores))
+    parts.append(bytes(snapshot.deck))
+    parts.append(encode_cards(snapshot.discard_pile))
+    for seat in snapshot.seats:
+        parts.extend((encode_cards(seat.hand), encode_cards(seat.victory_cards), encode_cards(seat.down_cards)))
+    parts.append(meld_groups)
+    parts.append(meld_sequences)
+    return b"".join(parts)
+
+
+def unpack_snapshot(data):
+    """Reads a checkpoint back into a snapshot, without its random number generator state.
+
+    The deck is left as a view of data rather than copied, so data mustn't change while the snapshot is in use.
+    """
+    view = memoryview(data)
+    (magic, version, round_number, dealer, turns, playing, winner, seat_count, deck_size, discard_pile_size,
+     meld_group_count, meld_sequence_count) = HEADER.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a version {VERSION} game checkpoint.")
+    offset = HEADER.size
+    seat_sizes = list(SEAT.iter_unpack(view[offset:offset + seat_count * SEAT.size]))
+    offset += seat_count * SEAT.size
+
+    def take(size):
+        nonlocal offset
+        offset += size
+        return view[offset - size:offset]
+
+    deck = take(deck_size)
+    discard_pile = tuple(decode_cards(take(discard_pile_size)))
+    seats = tuple(SeatSnapshot(hand=tuple(decode_cards(take(hand_size))),
+                               victory_cards=tuple(decode_cards(take(victory_card_count))),
+                               down_cards=tuple(decode_cards(take(down_card_count))),
+                               down=bool(down), claims=claims)
+                  for down, hand_size, victory_card_count, down_card_count, claims, _ in seat_sizes)
+    meld_groups = {}
+    melds = take(2 * meld_group_count)
+    for rank, seat_index in zip(melds[::2], melds[1::2]):
+        meld_groups.setdefault(rank, []).append(seat_index)
+    meld_sequences = tuple(tuple(take(4)) for _ in range(meld_sequence_count))
+    if offset != len(view):
+        raise ValueError("Game checkpoint has trailing data.")
+    return GameSnapshot(deck=deck, discard_pile=discard_pile, seats=seats,
+                        meld_groups=tuple((rank, tuple(owners)) for rank, owners in meld_groups.items()),
+                        meld_sequences=meld_sequences, round=round_number, dealer=dealer,
+                        scores=tuple(seat[-1] for seat in seat_sizes), turns=turns, playing=bool(playing),
+                        winner=None if winner == NO_WINNER else winner, rng_state=None)
+
+
+def dumps(game):
+    return pack_snapshot(game.snapshot())
+
+
+def loads(data, headless=True, seed=None):
+    """Returns a new game in the checkpointed state, seeded with seed."""
+    game = Game(headless=headless, seed=seed)
+    game.restore(unpack_snapshot(data))
+    return game
+
+
+def dump(game, file):
+    file.write(dumps(game))
+
+
+def load(file, headless=True, seed=None):
+    return loads(file.read(), headless, seed)
@@ -0,0 +1,237 @@
+"""An expected-value discard selector, for the AI and for rollouts.
+
+Each candidate discard is scored by the points the seat expects to be caught holding if it keeps the rest of the hand:
+the chance of not completing the round's contract times the hand's points, plus a cost for handing the next seat a
+card it wants. Once the seat is down, the contract is met and only the points and the feeding cost count.
+
+The chance of completing the contract comes from the partial groups in the hand. A set is a rank the hand holds some
+of, and a run is a four card window of a suit it holds some of. The outs of a group, the cards that would complete
+it, come from precomputed tables, and are counted among the cards the seat hasn't seen (see tracker). Each group is
+completed with the chance of drawing enough of its outs in the next few draws, and the best groups are assumed to be
+completed independently. Wild cards in the hand go to the groups they help the most.
+
+Removing a card only changes its rank's set and its suit's runs, so the other groups are scored once per hand.
+"""
+from functools import lru_cache
+from heapq import nlargest
+from math import comb
+
+from src.main import WILD_RANK, CARD_RANKS, CARD_SUITS, CARD_POINTS, SEQUENCE_LENGTH, SEQUENCE_WINDOWS, HIGH_ACE, \
+    encode_cards, popcount, suit_bitboards
+from src.tracker import TrackingPolicy, UnseenTracker
+
+# the draws a seat expects to make before the round is decided
+DRAWS = 6
+# the points a discard the next seat wants is taken to cost
+FEED_POINTS = 10
+
+# RUN_OUTS[suit][start][held] are the cards (rank and suit, as codes below 52) missing from the four card window of
+# the suit starting at run position start, where held has bit i set if the hand holds position start + i. Position 0
+# is a low Ace, and positions 1 to 13 are the ranks 2 to Ace (see main.suit_bitboards). Position 1 is left out: only a
+# wild card fills it, and the unseen wild cards are counted as outs of every group already.
+RUN_OUTS = tuple(tuple(tuple(tuple(suit * 13 + (start + offset - 1) % 13 for offset in range(SEQUENCE_LENGTH)
+                                   if not held >> offset & 1 and start + offset != 1)
+                             for held in range(1 << SEQUENCE_LENGTH))
+                       for start in range(len(SEQUENCE_WINDOWS)))
+                 for suit in range(4))
+HELD = (1 << SEQUENCE_LENGTH) - 1
+HELD_COUNTS = tuple(popcount(held) for held in range(1 << SEQUENCE_LENGTH))
+
+
+@lru_cache(maxsize=None)
+def completion_probability(need, outs, unseen, draws=DRAWS):
+    """The chance that draws cards, drawn from unseen cards of which outs are outs, include at least need outs."""
+    if need <= 0:
+        return 1.0
+    draws = min(draws, unseen)
+    if need > draws or need > outs:
+        return 0.0
+    return sum(comb(outs, hits) * comb(unseen - outs, draws - hits)
+               for hits in range(need, min(outs, draws) + 1)) / comb(unseen, draws)
+
+
+def set_group(count, rank_outs, wild_outs, unseen):
+    """A set of a rank the hand holds count of, as (chance of completing it, cards needed, natural cards, outs)."""
+    need = max(0, 3 - count)
+    outs = rank_outs + wild_outs
+    return completion_probability(need, outs, unseen), need, count, outs
+
+
+def suit_runs(suit, bitboard, unseen_cards, wild_outs, unseen, sequences):
+    """The most likely runs of the suit the bitboard holds some of, no two overlapping, as (chance, needed, natural
+    cards, outs), best first. At most sequences are returned."""
+    groups = []
+    if bitboard & HIGH_ACE:
+        bitboard |= 1
+    suit_outs = RUN_OUTS[suit]
+    for start in range(len(SEQUENCE_WINDOWS)):
+        held = bitboard >> start & HELD
+        if held:
+            naturals = HELD_COUNTS[held]
+            need = SEQUENCE_LENGTH - naturals
+            outs = wild_outs
+            for card in suit_outs[start][held]:
+                outs += unseen_cards[card]
+            groups.append((completion_probability(need, outs, unseen), need, naturals, outs, start))
+    groups.sort(reverse=True)
+    chosen = []
+    for group in groups:
+        if all(abs(group[4] - other[4]) >= SEQUENCE_LENGTH for other in chosen):
+            chosen.append(group)
+            if len(chosen) == sequences:
+                break
+    return [group[:4] for group in chosen]
+
+
+def contract_probability(groups, wild_count, unseen):
+    """The chance of completing the chosen groups, giving each wild card to the group it helps the most.
+
+    A group can't have more wild cards than natural ones.
+    """
+    if wild_count:
+        groups = [[probability, need, naturals, outs, 0] for probability, need, naturals, outs in groups]
+        for _ in range(wild_count):
+            best_gain = 1.0
+            best = None
+            for group in groups:
+                probability, need, naturals, outs, wilds = group
+                if need and wilds < naturals:
+                    gain = (completion_probability(need - 1, outs, unseen) / probability if probability
+                            else float("inf"))
+                    if gain > best_gain:
+                        best_gain = gain
+                        best = group
+            if best is None:
+                break
+            best[1] -= 1
+            best[4] += 1
+            best[0] = completion_probability(best[1], best[3], unseen)
+    probability = 1.0
+    for group in groups:
+        probability *= group[0]
+    return probability
+
+
+class DiscardScorer:
+    """Scores a seat's possible discards for a contract of three_of_a_kinds sets and sequences runs."""
+
+    def __init__(self, three_of_a_kinds, sequences):
+        self.three_of_a_kinds = three_of_a_kinds
+        self.sequences = sequences
+
+    def scores(self, codes, unseen_cards, rank_unseen, unseen, down=False, meldable=(), feeding=None):
+        """Returns the expected points of discarding each card in codes, lower being better.
+
+        unseen_cards and rank_unseen are the unseen copies of each card (below 52) and each rank, out of unseen
+        cards in all (see tracker.UnseenTracker). Natural cards of the meldable ranks cost no points, since they can
+        be melded once the seat is down. feeding, if given, maps each rank to how much (0 to 1) the next seat wants
+        it.
+        """
+        card_points = [0 if CARD_RANKS[code] in meldable else CARD_POINTS[code] for code in codes]
+        points = sum(card_points)
+        if down:
+            return [points - code_points + (feeding[CARD_RANKS[code]] * FEED_POINTS if feeding else 0)
+                    for code, code_points in zip(codes, card_points)]
+        counts = [0] * 13
+        copies = [0] * 52
+        for code in codes:
+            counts[CARD_RANKS[code]] += 1
+            copies[code % 52] += 1
+        wild_outs = rank_unseen[WILD_RANK]
+        sets = sorted(((set_group(counts[rank], rank_unseen[rank], wild_outs, unseen), rank)
+                       for rank in range(1, 13) if counts[rank]), reverse=True)
+        first = runs = None
+        if self.sequences:
+            first = suit_bitboards(codes)[0]
+            runs = [suit_runs(suit, first[suit], unseen_cards, wild_outs, unseen, self.sequences)
+                    for suit in range(4)]
+        scores = []
+        # without runs, the chance only depends on the discard's rank
+        probabilities = {}
+        for code, code_points in zip(codes, card_points):
+            rank = CARD_RANKS[code]
+            key = code % 52 if self.sequences and rank != WILD_RANK else rank
+            probability = probabilities.get(key)
+            if probability is None:
+                probability = probabilities[key] = self.probability_without(
+                    code, counts, copies, sets, first, runs, unseen_cards, rank_unseen, unseen)
+            score = (1 - probability) * (points - code_points)
+            if feeding is not None:
+                score += feeding[rank] * FEED_POINTS
+            scores.append(score)
+        return scores
+
+    def probability_without(self, code, counts, copies, sets, first, runs, unseen_cards, rank_unseen, unseen):
+        """The chance of completing the contract with the hand less the card."""
+        rank = CARD_RANKS[code]
+        wild_count = counts[WILD_RANK]
+        chosen = []
+        if rank == WILD_RANK:
+            wild_count -= 1
+            rank = None
+        if self.three_of_a_kinds:
+            chosen = [group for group, group_rank in sets if group_rank != rank][:self.three_of_a_kinds]
+            if rank is not None and counts[rank] > 1:
+                chosen.append(set_group(counts[rank] - 1, rank_unseen[rank], rank_unseen[WILD_RANK], unseen))
+                chosen.sort(reverse=True)
+                del chosen[self.three_of_a_kinds:]
+            if len(chosen) < self.three_of_a_kinds:
+                return 0.0
+        if self.sequences:
+            if rank is not None and copies[code % 52] == 1:
+                # the card's suit loses a run position, unless the hand has a second copy
+                suit = CARD_SUITS[code]
+                runs = list(runs)
+                runs[suit] = suit_runs(suit, first[suit] & ~(1 << (rank + 1)), unseen_cards, rank_unseen[WILD_RANK],
+                                       unseen, self.sequences)
+            best_runs = sorted((group for suit_groups in runs for group in suit_groups), reverse=True)
+            if len(best_runs) < self.sequences:
+                return 0.0
+            chosen += best_runs[:self.sequences]
+        return contract_probability(chosen, wild_count, unseen)
+
+
+def feeding(game, seat, tracker):
+    """How much the next seat wants each rank: wild cards always, ranks it can meld once it's down, and ranks the
+    seat knows it took from the discard pile."""
+    next_seat = game.seats[(seat.seat_index + 1) % len(game.seats)]
+    known = tracker.known[next_seat.seat_index]
+    wants = [min(1.0, 0.5 * sum(known[rank::13])) for rank in range(13)]
+    wants[WILD_RANK] = 1.0
+    if next_seat.down:
+        for rank in game.meld_index.groups:
+            wants[rank] = 1.0
+    return wants
+
+
+def discard_scores(game, seat, tracker=None):
+    """Scores each card in the seat's hand as a discard, from what the seat has seen."""
+    if tracker is None:
+        tracker = UnseenTracker.from_game(game, seat, listen=False)
+    contract = game.rounds[game.round]
+    scorer = DiscardScorer(contract["three_of_a_kinds"], contract["sequences"])
+    return scorer.scores(encode_cards(seat.hand.cards), tracker.unseen, tracker.rank_unseen, tracker.total,
+                         seat.down, game.meld_index.groups, feeding(game, seat, tracker))
+
+
+class ExpectedValuePolicy(TrackingPolicy):
+    """The tracking policy, discarding the card with the lowest expected points.
+
+    It never throws back the card it just took from the discard pile, unless it has nothing else to discard.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.taken = None
+
+    def draw_from_discard_pile(self, game, opponent):
+        take = super().draw_from_discard_pile(game, opponent)
+        self.taken = game.discard_pile[len(game.discard_pile) - 1] if take else None
+        return take
+
+    def discard_index(self, game, opponent):
+        scores = discard_scores(game, opponent, self.tracker_for(game, opponent))
+        cards = opponent.hand.cards
+        taken, self.taken = self.taken, None
+        return min((index for index in range(len(cards)) if cards[index] is not taken or len(cards) == 1),
+                   key=scores.__getitem__)
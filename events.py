@@ -0,0 +1,233 @@
+"""An append-only log of game events, and streaming readers to replay or summarize logged games.
+
+A log is a short header followed by events of four bytes each: kind, seat index, card code and argument (see
+main.Events). Each game starts with a GAME event and the cards already on the table as DEAL (hands and discard pile)
+and GO_DOWN (down cards, by group) events, so a game can be replayed from its own events alone. The deck's order
+isn't logged: replayed games put the cards nobody has seen back into the deck, in code order.
+
+Writers collect events in a buffer and write it out in large batches. Readers read a chunk at a time, so any number
+of logged games can be streamed in bounded memory.
+"""
+import argparse
+import struct
+from collections import Counter, namedtuple
+from itertools import chain
+
+from src.main import Game, Events, CARDS, encode_cards
+
+MAGIC = b"MAYE"
+VERSION = 2
+HEADER = struct.Struct("<4sH")
+EVENT = struct.Struct("<BBBB")
+
+Event = namedtuple("Event", ["kind", "seat", "card", "argument"])
+
+
+def card_events(kind, seat_index, codes, argument=0):
+    """The logged events of the kind by that seat for each of the card codes, packed."""
+    events = bytearray(EVENT.pack(kind, seat_index, 0, argument) * len(codes))
+    events[2::EVENT.size] = codes
+    return events
+
+
+class EventWriter:
+    """Appends the events of the games it records to a binary file.
+
+    The games' events are collected as the tuples they're emitted as, and packed into the buffer in one go when the
+    next game is recorded or the writer is flushed. The buffer is written out as each game is recorded once it holds
+    buffer_size bytes.
+    """
+
+    def __init__(self, file, buffer_size=1 << 16):
+        self.file = file
+        self.buffer_size = buffer_size
+        self.buffer = bytearray()
+        self.events = []
+        # where the last recorded state starts in the buffer, until the game's first event shows whether it's needed
+        self.state_start = None
+        if not file.tell():
+            file.write(HEADER.pack(MAGIC, VERSION))
+
+    def record(self, game):
+        """Logs the game's current state, then every event it emits.
+
+        If the first event is a new deal's GAME event (as when Game.play_match is recorded), the deal logs the table
+        itself, so the state is dropped rather than logged as a game of its own.
+        """
+        self.pack_events()
+        if len(self.buffer) >= self.buffer_size:
+            self.write()
+        buffer = self.buffer
+        self.state_start = len(buffer)
+        buffer += EVENT.pack(Events.GAME, Events.TABLE, 0, game.round)
+        for seat in game.seats:
+            buffer += card_events(Events.DEAL, seat.seat_index, encode_cards(seat.hand.cards))
+        buffer += card_events(Events.DEAL, Events.TABLE, encode_cards(game.discard_pile.cards))
+        for seat in game.seats:
+            if seat.down_cards.cards:
+                for group_index, group in enumerate(game.down_card_groups(seat)):
+                    buffer += card_events(Events.GO_DOWN, seat.seat_index, encode_cards(group), group_index)
+        game.listeners.append(self.events.append)
+
+    def pack_events(self):
+        """Moves the events collected so far into the buffer."""
+        events = self.events
+        if not events:
+            return
+        if self.state_start is not None:
+            if events[0][0] == Events.GAME:
+                del self.buffer[self.state_start:]
+            self.state_start = None
+        self.buffer += bytes(chain.from_iterable(events))
+        events.clear()
+
+    def write(self):
+        self.file.write(self.buffer)
+        self.buffer.clear()
+        # the recorded state is out of reach now
+        self.state_start = None
+
+    def flush(self):
+        self.pack_events()
+        self.write()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_events(file, chunk_size=1 << 16):
+    """Yields the events in a log, reading chunk_size bytes at a time."""
+    magic, version = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a version {VERSION} event log.")
+    chunk_size -= chunk_size % EVENT.size
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            return
+        yield from map(Event._make, EVENT.iter_unpack(chunk))
+
+
+def read_games(events):
+    """Splits a stream of events into lists of each game's events."""
+    game_events = []
+    for event in events:
+        if event.kind == Events.GAME and game_events:
+            yield game_events
+            game_events = []
+        game_events.append(event)
+    if game_events:
+        yield game_events
+
+
+def replay(game_events):
+    """Returns a headless game in the state the events lead to."""
+    game = Game(headless=True)
+    seats = game.seats
+    for seat in seats:
+        seat.hand.empty()
+        seat.down_cards.empty()
+    game.discard_pile.empty()
+    # the seat whose GO_DOWN events are being read, and its groups so far, registered once they're all read
+    going_down = None
+    groups = {}
+    for kind, seat_index, code, argument in game_events:
+        card = CARDS[code]
+        seat = None if seat_index == Events.TABLE else seats[seat_index]
+        if going_down is not None and (kind != Events.GO_DOWN or seat is not going_down):
+            game.meld_index.go_down(going_down.down_cards, [encode_cards(group) for group in groups.values()])
+            going_down = None
+            groups = {}
+        if kind == Events.GAME:
+            game.round = argument
+        elif kind == Events.DEAL:
+            (game.discard_pile if seat is None else seat.hand).add(card)
+        elif kind == Events.DRAW:
+            game.turns += 1
+            if argument:
+                game.discard_pile.deal()
+            seat.hand.add(card)
+        elif kind == Events.GO_DOWN:
+            if card in seat.hand.cards:
+                seat.hand.remove(card)
+            seat.down_cards.add(card)
+            seat.victory_cards.add(card)
+            seat.down = True
+            going_down = seat
+            groups.setdefault(argument, []).append(card)
+        elif kind == Events.MELD:
+            game.meld(seat, card, seats[argument].down_cards)
+        elif kind == Events.DISCARD:
+            seat.hand.remove(card)
+            game.discard_pile.add(card)
+        elif kind == Events.MAY_I:
+            if not argument:
+                game.discard_pile.deal()
+                seat.claims += 1
+            seat.hand.add(card)
+        elif kind == Events.RESHUFFLE:
+            game.discard_pile.cards = list(game.discard_pile.cards)[-1:]
+        elif kind == Events.WIN:
+            game.winner = seat
+            game.playing = False
+    if going_down is not None:
+        game.meld_index.go_down(going_down.down_cards, [encode_cards(group) for group in groups.values()])
+    game.down = game.player.down
+    # the deck gets both copies of each card, less the copies on the table
+    copies_left = [2] * 52
+    for stack in [game.discard_pile] + [seat.hand for seat in seats] + [seat.down_cards for seat in seats]:
+        for code in encode_cards(stack.cards):
+            copies_left[code % 52] -= 1
+    game.deck.load([copy * 52 + code for code in range(52) for copy in range(copies_left[code])])
+    game.update_all_down_card_values()
+    return game
+
+
+def summarize(events):
+    """Aggregates statistics over a stream of logged games, keeping only running totals."""
+    games = wins = draws = discard_pile_draws = melds = claims = 0
+    seat_wins = Counter()
+    for kind, seat_index, code, argument in events:
+        if kind == Events.GAME:
+            games += 1
+        elif kind == Events.DRAW:
+            draws += 1
+            discard_pile_draws += argument
+        elif kind == Events.MELD:
+            melds += 1
+        elif kind == Events.MAY_I:
+            claims += not argument
+        elif kind == Events.WIN:
+            wins += 1
+            seat_wins[seat_index] += 1
+    return {"games": games, "finished": wins, "turns": draws, "discard_pile_draws": discard_pile_draws,
+            "melds": melds, "may_i_claims": claims, "seat_wins": dict(sorted(seat_wins.items()))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record headless games to an event log, or summarize a log.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record_parser = subparsers.add_parser("record")
+    record_parser.add_argument("path")
+    record_parser.add_argument("--games", type=int, default=1000)
+    record_parser.add_argument("--seed", type=int, default=0)
+    summarize_parser = subparsers.add_parser("summarize")
+    summarize_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        writer = EventWriter(open(args.path, "ab"))
+        for game_number in range(args.games):
+            game = Game(headless=True, seed=(args.seed << 32) | game_number)
+            writer.record(game)
+            game.play_headless()
+        writer.close()
+    else:
+        with open(args.path, "rb") as log_file:
+            for name, value in summarize(read_events(log_file)).items():
+                print(f"{name}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""Differential fuzzing of the victory conditions against a brute-force oracle.
+
+The oracle is deliberately slow and simple. It tries every way of picking a round's groups out of a hand, straight
+from the rules:
+
+- a three of a kind is three cards of one natural rank, one of which may be a wild card (a 2). A contract's three of
+  a kinds are of different ranks.
+- a sequence is four cards of one suit in consecutive positions, the Ace playing low (below the 2) or high (above the
+  King). Wild cards may fill positions, and are the only cards that can fill the 2's, but may not outnumber the
+  natural cards.
+
+Larger groups always contain one of these, so the oracle never needs them, and cards left over stay in the hand. The
+groups are listed once, and the oracle picks them in list order, since the order they're picked in doesn't matter.
+Sequences are picked before three of a kinds, only because a contract has fewer of them.
+
+Each hand is checked with the round's evaluator in Game.rounds, which should agree with the oracle, and whose victory
+cards should make the contract themselves when it says the hand goes down. Round 1 and 4 hands are also checked with
+the batched evaluators in vectorized, when NumPy is installed. Hands are uniformly random, or adversarial: built from
+near-complete groups, heavy on wild cards, second copies and Aces. A hand the evaluators get wrong is shrunk by
+removing cards while they still get it wrong.
+
+Hands are sharded across a process pool, each shard seeded by the fuzzing seed and its number alone, so a run (and
+any failure in it) is reproducible however it was split.
+"""
+import argparse
+import random
+import time
+from collections import Counter, namedtuple
+from multiprocessing import Pool
+
+import pydealer
+
+from src.main import Game, Hand, CARD_RANKS, WILD_RANK, ACE_RANK, SEQUENCE_LENGTH, encode_cards, decode_cards
+
+ROUNDS = Game(headless=True, seed=0).rounds
+# run positions 0 to 13: a low Ace, the 2 to the King, and a high Ace
+POSITION_RANKS = (ACE_RANK,) + tuple(range(13))
+MAX_HAND_SIZE = 16
+
+
+def multisets(items, size):
+    """Every multiset of size items, each item used at most twice (there are two copies of each card)."""
+    if not size:
+        return [()]
+    if not items:
+        return []
+    first, rest = items[0], items[1:]
+    return [(first,) * copies + tail for copies in range(min(2, size), -1, -1)
+            for tail in multisets(rest, size - copies)]
+
+
+def needs(naturals):
+    """The natural cards as (card, copies) pairs."""
+    return tuple(Counter(naturals).items())
+
+
+# every three of a kind, by rank, as (rank, natural cards needed, wild cards)
+THREE_OF_A_KINDS = tuple((rank, needs(naturals), 3 - len(naturals)) for rank in range(1, 13) for size in (3, 2)
+                         for naturals in multisets(tuple(range(rank, 52, 13)), size))
+
+
+def window_sequences(positions):
+    """Every sequence in the window of cards, as (natural cards needed, wild cards). A 2's position always takes a
+    wild card."""
+    sequences = []
+    for fill in range(1 << SEQUENCE_LENGTH):
+        naturals = tuple(card for offset, card in enumerate(positions) if fill >> offset & 1)
+        wilds = SEQUENCE_LENGTH - len(naturals)
+        if all(CARD_RANKS[card] != WILD_RANK for card in naturals) and wilds <= len(naturals):
+            sequences.append((needs(naturals), wilds))
+    return tuple(sequences)
+
+
+# every four position window of a suit, as its cards and its sequences
+WINDOWS = tuple((positions, window_sequences(positions))
+                for suit in range(4) for start in range(len(POSITION_RANKS) + 1 - SEQUENCE_LENGTH)
+                for positions in [tuple(suit * 13 + POSITION_RANKS[start + offset]
+                                        for offset in range(SEQUENCE_LENGTH))])
+
+# round is the round whose contract the hand (card codes) was checked against, and evaluator the check that failed
+Failure = namedtuple("Failure", ["round", "codes", "evaluator", "expected"])
+
+
+def available(needed, group_wilds, cards, wilds):
+    return group_wilds <= wilds and all(cards[card] >= copies for card, copies in needed)
+
+
+def oracle(codes, three_of_a_kinds, sequences):
+    """Whether the hand, given as card codes, can make a contract of three_of_a_kinds and sequences."""
+    cards = [0] * 52
+    wilds = 0
+    for code in codes:
+        if CARD_RANKS[code] == WILD_RANK:
+            wilds += 1
+        else:
+            cards[code % 52] += 1
+    # groups the whole hand can't make can't be made from what's left of it either, and every group has at least two
+    # natural cards
+    sequence_groups = [group for positions, groups in WINDOWS if sequences
+                       and sum(cards[card] > 0 for card in positions if CARD_RANKS[card] != WILD_RANK) >= 2
+                       for group in groups if available(*group, cards, wilds)]
+    set_groups = [group for group in THREE_OF_A_KINDS if three_of_a_kinds and sum(cards[group[0]::13]) >= 2
+                  and available(*group[1:], cards, wilds)]
+    return search(cards, wilds, three_of_a_kinds, sequences, 0, sequence_groups, set_groups)
+
+
+def search(cards, wilds, three_of_a_kinds, sequences, start, sequence_groups, set_groups):
+    """Picks the groups left to find, sequences first, taking each kind in list order from start."""
+    if sequences:
+        for index in range(start, len(sequence_groups)):
+            needed, group_wilds = sequence_groups[index]
+            if available(needed, group_wilds, cards, wilds):
+                remaining = list(cards)
+                for card, copies in needed:
+                    remaining[card] -= copies
+                # a sequence can be picked twice, from both copies of its cards
+                if search(remaining, wilds - group_wilds, three_of_a_kinds, sequences - 1,
+                          index if sequences > 1 else 0, sequence_groups, set_groups):
+                    return True
+        return False
+    if not three_of_a_kinds:
+        return True
+    for index in range(start, len(set_groups)):
+        rank, needed, group_wilds = set_groups[index]
+        if available(needed, group_wilds, cards, wilds):
+            remaining = list(cards)
+            for card, copies in needed:
+                remaining[card] -= copies
+            # the next three of a kind must be of a higher rank
+            next_rank = index
+            while next_rank < len(set_groups) and set_groups[next_rank][0] == rank:
+                next_rank += 1
+            if search(remaining, wilds - group_wilds, three_of_a_kinds - 1, 0, next_rank, sequence_groups,
+                      set_groups):
+                return True
+    return False
+
+
+def contract_oracle(round_number, codes):
+    contract = ROUNDS[round_number]
+    return oracle(codes, contract["three_of_a_kinds"], contract["sequences"])
+
+
+def evaluate(round_number, codes):
+    """The round's evaluator, as the game calls it."""
+    return bool(ROUNDS[round_number]["func"](Hand(cards=decode_cards(codes)), pydealer.Stack()))
+
+
+def evaluate_victory_cards(round_number, codes):
+    """Whether the round's evaluator goes down with victory cards that make the contract."""
+    victory_cards = pydealer.Stack()
+    if not ROUNDS[round_number]["func"](Hand(cards=decode_cards(codes)), victory_cards):
+        return False
+    return contract_oracle(round_number, encode_cards(victory_cards.cards))
+
+
+def evaluate_batch(round_number, codes):
+    """The batched evaluator, on a batch of the one hand."""
+    from src.vectorized import evaluate_round
+    return bool(evaluate_round(round_number, [bytes(codes)])[0][0])
+
+
+EVALUATORS = {
+    "evaluator": evaluate,
+    "victory cards": evaluate_victory_cards,
+}
+# batched evaluators, by round
+BATCH_EVALUATORS = {1: evaluate_batch, 4: evaluate_batch}
+
+
+def evaluators(round_number):
+    found = dict(EVALUATORS)
+    if round_number in BATCH_EVALUATORS:
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            pass
+        else:
+            found["vectorized"] = BATCH_EVALUATORS[round_number]
+    return found
+
+
+def random_hand(rng):
+    return rng.sample(range(104), rng.randint(0, MAX_HAND_SIZE))
+
+
+def adversarial_hand(rng):
+    """A hand built from pieces of groups, so it's often a card either side of making a contract."""
+    cards = []
+    for _ in range(rng.randint(1, 6)):
+        piece = rng.randrange(5)
+        if piece == 0:
+            # some of a rank
+            rank = rng.randrange(1, 13)
+            cards += [rng.randrange(4) * 13 + rank for _ in range(rng.randint(1, 4))]
+        elif piece == 1:
+            # part of a run of a suit, with gaps, the Ace maybe at either end
+            suit = rng.randrange(4)
+            start = rng.randrange(len(POSITION_RANKS) - 1)
+            cards += [suit * 13 + POSITION_RANKS[position]
+                      for position in range(start, min(start + rng.randint(2, 6), len(POSITION_RANKS)))
+                      if rng.random() < 0.75]
+        elif piece == 2:
+            cards += [rng.randrange(4) * 13 + WILD_RANK for _ in range(rng.randint(1, 3))]
+        elif piece == 3:
+            cards += [rng.randrange(4) * 13 + ACE_RANK for _ in range(rng.randint(1, 2))]
+        else:
+            cards += [code % 52 for code in rng.sample(range(104), rng.randint(1, 4))]
+    # each card has two copies, the second being the card's code plus 52
+    codes = [card + copy * 52 for card, count in Counter(cards).items() for copy in range(min(count, 2))]
+    rng.shuffle(codes)
+    return codes[:MAX_HAND_SIZE]
+
+
+def check(round_number, codes, checks=None):
+    """Returns a Failure for the first evaluator that disagrees with the oracle about the hand, or None."""
+    expected = contract_oracle(round_number, codes)
+    for name, evaluator in (checks or evaluators(round_number)).items():
+        if evaluator(round_number, codes) != expected:
+            return Failure(round_number, tuple(codes), name, expected)
+    return None
+
+
+def shrink(failure):
+    """Removes cards from a failing hand, and swaps second copies for first ones, while the same evaluator still
+    disagrees with the oracle. Returns the smallest Failure found."""
+    checks = {failure.evaluator: evaluators(failure.round)[failure.evaluator]}
+    codes = list(failure.codes)
+    shrunk = True
+    while shrunk:
+        shrunk = False
+        candidates = [codes[:index] + codes[index + 1:] for index in range(len(codes))]
+        candidates += [codes[:index] + [code - 52] + codes[index + 1:] for index, code in enumerate(codes)
+                       if code >= 52 and code - 52 not in codes]
+        for candidate in candidates:
+            smaller = check(failure.round, candidate, checks)
+            if smaller is not None:
+                failure = smaller
+                codes = candidate
+                shrunk = True
+                break
+    return failure._replace(codes=tuple(sorted(failure.codes)))
+
+
+def shard_seed(seed, shard):
+    return (seed << 32) | shard
+
+
+def fuzz_shard(args):
+    """Checks hands random hands, half of them adversarial, against random rounds. Returns the number checked and
+    the distinct shrunk Failures."""
+    seed, shard, hands = args
+    rng = random.Random(shard_seed(seed, shard))
+    failures = {}
+    for hand_number in range(hands):
+        round_number = rng.randint(1, len(ROUNDS))
+        codes = adversarial_hand(rng) if hand_number % 2 else random_hand(rng)
+        failure = check(round_number, codes)
+        if failure is not None:
+            failure = shrink(failure)
+            failures[failure[:3]] = failure
+    return hands, list(failures.values())
+
+
+def fuzz(hands, seed=0, processes=None, shard_size=10000):
+    """Yields each shard's (hands checked, Failures), in completion order."""
+    tasks = [(seed, shard, min(shard_size, hands - start))
+             for shard, start in enumerate(range(0, hands, shard_size))]
+    if processes == 1:
+        yield from map(fuzz_shard, tasks)
+        return
+    with Pool(processes) as pool:
+        yield from pool.imap_unordered(fuzz_shard, tasks)
+
+
+def describe(failure):
+    return (f"round {failure.round}, {failure.evaluator} should say {failure.expected}: "
+            f"{' '.join(str(card) for card in decode_cards(failure.codes))} (codes {list(failure.codes)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzz the victory conditions against a brute-force oracle.")
+    parser.add_argument("--hands", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None, help="defaults to the number of cores")
+    parser.add_argument("--shard-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    checked = 0
+    failures = {}
+    start = time.perf_counter()
+    for shard_hands, shard_failures in fuzz(args.hands, args.seed, args.processes, args.shard_size):
+        checked += shard_hands
+        for failure in shard_failures:
+            failures[failure[:3]] = failure
+    elapsed = time.perf_counter() - start
+    print(f"{checked} hands in {elapsed:.1f}s ({checked / elapsed:.0f} hands/s), {len(failures)} distinct failures")
+    # the smallest first
+    for failure in sorted(failures.values(), key=lambda failure: (len(failure.codes), failure))[:20]:
+        print(describe(failure))
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
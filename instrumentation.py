@@ -0,0 +1,218 @@
+"""Opt-in counters and latency histograms for the phases of a turn and the AI's decisions.
+
+    instrumentation = instrument(game)
+    game.play_headless()
+    print(instrumentation.summary())
+    uninstrument(game)
+
+Instrumenting a game swaps its class, and the classes of its seats' policies, for subclasses whose phase and decision
+methods time each call. The classes themselves are never changed, so an uninstrumented game runs exactly the code it
+always did, with no timer calls. Clones of an instrumented game are instrumented too, and record into the same
+Instrumentation, so lookahead done on clones is counted.
+
+Each phase's time includes the phases it calls: ai_draw includes offer_discard, and can_go_down the victory check and
+select_down_cards. The interactive phases include the time spent waiting for answers.
+"""
+import argparse
+import json
+from collections import Counter
+from inspect import getattr_static
+from time import perf_counter_ns
+
+from src.main import Game, Events
+
+# the Game methods timed, covering players_turn, opponents_turn and what they call
+PHASES = ("players_turn", "opponents_turn", "prompt_for_card_draw", "ai_draw", "offer_discard", "can_go_down",
+          "select_down_cards", "prompt_to_go_down", "ai_go_down", "prompt_to_meld", "auto_meld",
+          "prompt_for_discard", "ai_discard", "check_for_winner")
+# the policy methods timed
+DECISIONS = ("draw_from_discard_pile", "go_down", "discard_index", "may_i")
+VICTORY_CHECK = "victory check"
+EVENT_NAMES = {value: name for name, value in vars(Events).items() if name.isupper()}
+
+
+class LatencyHistogram:
+    """Counts latencies in power-of-two buckets of nanoseconds: bucket b holds those below 2**b ns but not below
+    2**(b-1) ns."""
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = Counter()
+
+    def record(self, ns):
+        self.calls += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+        self.buckets[ns.bit_length()] += 1
+
+    def percentile(self, fraction):
+        """An upper bound on the latency below which the fraction of calls fell, in nanoseconds."""
+        if not self.calls:
+            return 0
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= fraction * self.calls:
+                return min(1 << bucket, self.max_ns)
+        return self.max_ns
+
+    def snapshot(self):
+        return {"calls": self.calls, "total_ns": self.total_ns, "max_ns": self.max_ns,
+                "buckets": {str(bucket): count for bucket, count in sorted(self.buckets.items())}}
+
+
+class Instrumentation:
+    def __init__(self):
+        self.histograms = {}
+        # events seen, by kind name
+        self.counters = Counter()
+
+    def record(self, name, ns):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.record(ns)
+
+    def timed(self, name, function):
+        """Wraps function to record the latency of each call under name."""
+        def timed_function(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(name, perf_counter_ns() - start)
+        return timed_function
+
+    def __call__(self, event):
+        self.counters[EVENT_NAMES.get(event[0], str(event[0]))] += 1
+
+    def reset(self):
+        self.histograms.clear()
+        self.counters.clear()
+
+    def summary(self):
+        """A table of each phase and decision's calls and latencies, most total time first."""
+        lines = [f"{'phase':34} {'calls':>8} {'total ms':>10} {'mean µs':>9} {'p50 µs':>9} {'p99 µs':>9} "
+                 f"{'max µs':>9}"]
+        for name, histogram in sorted(self.histograms.items(), key=lambda item: -item[1].total_ns):
+            lines.append(f"{name:34} {histogram.calls:8} {histogram.total_ns / 1e6:10.2f} "
+                         f"{histogram.total_ns / histogram.calls / 1e3:9.1f} {histogram.percentile(0.5) / 1e3:9.1f} "
+                         f"{histogram.percentile(0.99) / 1e3:9.1f} {histogram.max_ns / 1e3:9.1f}")
+        if self.counters:
+            lines.append("")
+            lines.append("events: " + ", ".join(f"{name} {count}" for name, count in sorted(self.counters.items())))
+        return "\n".join(lines)
+
+    def snapshot(self):
+        """The histograms and counters as plain data, ready for json.dump."""
+        return {"phases": {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+                "events": dict(self.counters)}
+
+
+def game_instrumentation(game, args):
+    return game.instrumentation
+
+
+def decision_instrumentation(policy, args):
+    # a policy's first argument is the game it's deciding for
+    return getattr(args[0], "instrumentation", None) if args else None
+
+
+def timed_method(name, method, instrumentation_of):
+    """Wraps method, a function or staticmethod as found in a class, to record each call's latency under name."""
+    def timed(self, *args, **kwargs):
+        instrumentation = instrumentation_of(self, args)
+        if instrumentation is None:
+            return method.__get__(self)(*args, **kwargs)
+        start = perf_counter_ns()
+        try:
+            return method.__get__(self)(*args, **kwargs)
+        finally:
+            instrumentation.record(name, perf_counter_ns() - start)
+    timed.__name__ = method.__get__(None, object).__name__
+    timed.__doc__ = method.__doc__
+    return timed
+
+
+_instrumented_classes = {}
+
+
+def instrumented_class(cls, methods, prefix, instrumentation_of):
+    """A cached subclass of cls timing the named methods it has."""
+    instrumented = _instrumented_classes.get(cls)
+    if instrumented is None:
+        namespace = {name: timed_method(prefix + name, getattr_static(cls, name), instrumentation_of)
+                     for name in methods if callable(getattr(cls, name, None))}
+        namespace["uninstrumented_class"] = cls
+        instrumented = _instrumented_classes[cls] = type(f"Instrumented{cls.__name__}", (cls,), namespace)
+    return instrumented
+
+
+def policies(game):
+    found = {id(seat.policy): seat.policy for seat in game.seats if getattr(seat, "policy", None) is not None}
+    policy = getattr(game.player_input, "policy", None)
+    if policy is not None:
+        found[id(policy)] = policy
+    return found.values()
+
+
+def instrument(game, instrumentation=None):
+    """Starts recording the game's phases, decisions and events, into a new Instrumentation unless one is given.
+    Returns the Instrumentation."""
+    if game.instrumentation is not None:
+        return game.instrumentation
+    instrumentation = instrumentation or Instrumentation()
+    game.instrumentation = instrumentation
+    game.__class__ = instrumented_class(type(game), PHASES, "", game_instrumentation)
+    for policy in policies(game):
+        if not hasattr(type(policy), "uninstrumented_class"):
+            policy.__class__ = instrumented_class(type(policy), DECISIONS, "policy.", decision_instrumentation)
+    # the rounds may be shared with clones made earlier, so they're swapped for a copy with timed victory checks
+    game.uninstrumented_rounds = game.rounds
+    game.rounds = {round_number: dict(contract, func=instrumentation.timed(VICTORY_CHECK, contract["func"]))
+                   for round_number, contract in game.rounds.items()}
+    game.listeners.append(instrumentation)
+    return instrumentation
+
+
+def uninstrument(game):
+    """Stops recording, returning the game and its policies to their own classes."""
+    instrumentation = game.instrumentation
+    if instrumentation is None:
+        return
+    game.instrumentation = None
+    game.__class__ = type(game).uninstrumented_class
+    for policy in policies(game):
+        uninstrumented_class = getattr(type(policy), "uninstrumented_class", None)
+        if uninstrumented_class is not None:
+            policy.__class__ = uninstrumented_class
+    game.rounds = game.uninstrumented_rounds
+    del game.uninstrumented_rounds
+    game.listeners.remove(instrumentation)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play instrumented headless games, printing where the time went.")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-turns", type=int, default=1000)
+    parser.add_argument("--json", help="also write a snapshot of the measurements to this path")
+    args = parser.parse_args()
+
+    instrumentation = Instrumentation()
+    for game_number in range(args.games):
+        game = Game(headless=True, seed=args.seed + game_number)
+        instrument(game, instrumentation)
+        game.play_headless(max_turns=args.max_turns)
+        uninstrument(game)
+    print(instrumentation.summary())
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(instrumentation.snapshot(), json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""An information set Monte Carlo policy for the AI.
+
+At each decision (draw from the discard pile, go down, which card to discard) the searching seat only knows its own
+hand, the discard pile, everyone's down cards, how many cards are in each hand and the deck, and which cards the
+other seats took from the discard pile (see tracker). Every iteration samples the hidden cards consistently with that
+view (a determinization), picks a root action by UCB1, and plays the rest of the game out with the heuristic AI.
+Determinizations are restored into one game per search rather than dealing a new game for each. This is the
+single-level form of ISMCTS: statistics are only kept for the root actions, which keeps iterations cheap enough to
+run thousands of rollouts per move.
+
+Searches stop at a wall-clock budget per move, and can be spread across several processes by root parallelization:
+each worker searches the same view with its own random stream, and the root statistics are summed.
+"""
+import math
+import random
+import time
+from collections import namedtuple
+from multiprocessing import Pool
+
+from src.main import Game, GameSnapshot, SeatSnapshot, HeuristicPolicy, encode_cards, decode_cards
+from src.tracker import UnseenTracker
+
+# everything a seat knows when it has to decide
+SeatView = namedtuple("SeatView", ["round", "seat_index", "hand", "hand_sizes", "down_cards", "melds", "down",
+                                   "claims", "discard_pile", "deck_size", "turns", "known"])
+
+DRAW = "draw"
+GO_DOWN = "go_down"
+DISCARD = "discard"
+
+
+def seat_view(game, opponent, tracker=None):
+    """The seat's view of the game. known lists the cards (codes below 52) the tracker, if given, saw each seat take
+    from the discard pile and not play since."""
+    seats = game.seats
+    return SeatView(round=game.round,
+                    seat_index=seats.index(opponent),
+                    hand=encode_cards(opponent.hand.cards),
+                    hand_sizes=tuple(len(seat.hand) for seat in seats),
+                    down_cards=tuple(encode_cards(seat.down_cards.cards) for seat in seats),
+                    melds=game.meld_index.layout({id(seat.down_cards): seat_index
+                                                  for seat_index, seat in enumerate(seats)}),
+                    down=tuple(seat.down for seat in seats),
+                    claims=tuple(seat.claims for seat in seats),
+                    discard_pile=encode_cards(game.discard_pile.cards),
+                    deck_size=len(game.deck),
+                    turns=game.turns,
+                    known=tuple(() if tracker is None or seat_index == tracker.seat_index else
+                                tuple(card for card, count in enumerate(tracker.known[seat_index])
+                                      for _ in range(count))
+                                for seat_index in range(len(seats))))
+
+
+def determinize(view, rng, game=None):
+    """Restores a headless game (a new one unless given) to match the view, with the cards the seat can't see dealt
+    at random, except that the cards it knows other seats took from the discard pile stay in their hands."""
+    seen = set(view.hand).union(view.discard_pile, *view.down_cards)
+    unseen = [code for code in range(104) if code not in seen]
+    hands = [[] for _ in view.hand_sizes]
+    hands[view.seat_index] = list(view.hand)
+    for seat_index, known in enumerate(view.known):
+        hand = hands[seat_index]
+        for card in known:
+            # either copy of the card, if one is still unseen
+            for code in (card, card + 52):
+                if code in unseen and len(hand) < view.hand_sizes[seat_index]:
+                    unseen.remove(code)
+                    hand.append(code)
+                    break
+    rng.shuffle(unseen)
+    for seat_index, hand in enumerate(hands):
+        if seat_index != view.seat_index:
+            dealt = view.hand_sizes[seat_index] - len(hand)
+            hand += unseen[:dealt]
+            del unseen[:dealt]
+
+    if game is None:
+        game = Game(headless=True)
+    game.restore(GameSnapshot(
+        deck=bytes(unseen),
+        discard_pile=tuple(decode_cards(view.discard_pile)),
+        seats=tuple(SeatSnapshot(tuple(decode_cards(hand)), (), tuple(decode_cards(down_cards)), down, claims)
+                    for hand, down_cards, down, claims in zip(hands, view.down_cards, view.down, view.claims)),
+        meld_groups=view.melds[0],
+        meld_sequences=view.melds[1],
+        round=view.round,
+        dealer=game.dealer,
+        scores=game.scores,
+        turns=view.turns,
+        playing=True,
+        winner=None,
+        rng_state=None))
+    game.rng.seed(rng.getrandbits(32))
+    return game
+
+
+def rollout(view, decision, action, rng, max_turns, game=None):
+    """Plays a determinization out after taking the action, returning the searching seat's reward in [0, 1]. The
+    determinization is restored into game, if given."""
+    game = determinize(view, rng, game)
+    seat = game.seats[view.seat_index]
+    if decision == DRAW:
+        game.ai_draw(seat, action)
+        game.ai_go_down(seat)
+    elif decision == GO_DOWN:
+        game.ai_go_down(seat, go_down=action)
+    if decision != DISCARD:
+        if seat.down:
+            game.auto_meld(seat)
+        game.ai_discard(seat)
+    else:
+        game.discard(action, seat.hand)
+    game.check_for_winner(seat)
+    if game.playing:
+        game.play_headless(max_turns=view.turns + max_turns, seat_index=(view.seat_index + 1) % len(game.seats))
+    # the share of the other seats left holding more points (the winner holds none), counting ties as half
+    points = seat.hand.points
+    others = [other.hand.points for other in game.seats if other is not seat]
+    return (sum(other > points for other in others) + 0.5 * sum(other == points for other in others)) / len(others)
+
+
+def search(view, decision, actions, time_budget, seed, max_turns, exploration=math.sqrt(2)):
+    """Runs UCB1 over the root actions until the budget runs out, returning (reward totals, visits)."""
+    rng = random.Random(seed)
+    game = Game(headless=True)
+    totals = [0.0] * len(actions)
+    visits = [0] * len(actions)
+    deadline = time.perf_counter() + time_budget
+    iterations = 0
+    while iterations < len(actions) or time.perf_counter() < deadline:
+        if iterations < len(actions):
+            choice = iterations
+        else:
+            log_iterations = math.log(iterations)
+            choice = max(range(len(actions)), key=lambda index: totals[index] / visits[index]
+                         + exploration * math.sqrt(log_iterations / visits[index]))
+        totals[choice] += rollout(view, decision, actions[choice], rng, max_turns, game)
+        visits[choice] += 1
+        iterations += 1
+    return totals, visits
+
+
+def search_worker(args):
+    return search(*args)
+
+
+class ISMCTSPolicy:
+    """A drop-in replacement for HeuristicPolicy that searches each decision within time_budget seconds."""
+
+    def __init__(self, time_budget=0.1, processes=1, max_turns=60, seed=None):
+        self.time_budget = time_budget
+        self.processes = processes
+        self.max_turns = max_turns
+        self.rng = random.Random(seed)
+        self.game = None
+        self.tracker = None
+        self.pool = None
+        self.rollouts = 0
+        self.search_time = 0.0
+
+    @property
+    def rollouts_per_second(self):
+        return self.rollouts / self.search_time if self.search_time else 0.0
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def tracker_for(self, game, opponent):
+        """The seat's tracker for the game, started the first time the policy is asked about it."""
+        if self.game is not game:
+            self.game = game
+            self.tracker = UnseenTracker.from_game(game, opponent)
+        return self.tracker
+
+    def choose(self, game, opponent, decision, actions):
+        tracker = self.tracker_for(game, opponent)
+        if len(actions) == 1:
+            return actions[0]
+        view = seat_view(game, opponent, tracker)
+        start = time.perf_counter()
+        if self.processes > 1:
+            if self.pool is None:
+                self.pool = Pool(self.processes)
+            tasks = [(view, decision, actions, self.time_budget, self.rng.getrandbits(64), self.max_turns)
+                     for _ in range(self.processes)]
+            results = self.pool.map(search_worker, tasks)
+            visits = [sum(result[1][index] for result in results) for index in range(len(actions))]
+        else:
+            _, visits = search(view, decision, actions, self.time_budget, self.rng.getrandbits(64), self.max_turns)
+        self.search_time += time.perf_counter() - start
+        self.rollouts += sum(visits)
+        return actions[max(range(len(actions)), key=visits.__getitem__)]
+
+    def draw_from_discard_pile(self, game, opponent):
+        if not game.discard_pile:
+            return False
+        return self.choose(game, opponent, DRAW, [False, True])
+
+    def go_down(self, game, opponent):
+        return self.choose(game, opponent, GO_DOWN, [True, False])
+
+    def may_i(self, game, opponent):
+        # asked after every discard, so too often to search
+        return HeuristicPolicy.may_i(game, opponent)
+
+    def discard_index(self, game, opponent):
+        # identical cards are the same action, so only search the first of each
+        first_indices = {}
+        for index, code in enumerate(encode_cards(opponent.hand.cards)):
+            first_indices.setdefault(code % 52, index)
+        return self.choose(game, opponent, DISCARD, sorted(first_indices.values()))
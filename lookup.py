@@ -0,0 +1,142 @@
+"""A precomputed, memory-mapped table of round 1 go-down results.
+
+Round 1 only cares whether each natural rank has fewer than two, exactly two, or three or more cards, and whether
+there are no, one, or two or more wild cards. That reduces a hand to 13 "levels", each 0-2. The builder enumerates
+every level vector reachable with up to ``max_hand_size`` cards, and stores the ``two_three_of_a_kind_ranks`` result
+for each at the vector's rank among them (a minimal perfect hash), as a 16 bit entry: the victory rank bitmask, with
+the top bit set if the hand can go down.
+
+The table file is memory-mapped read-only, so every worker process shares the one copy in the page cache.
+"""
+import argparse
+import mmap
+import struct
+import sys
+from array import array
+
+from src.main import VictoryConditions, WILD_RANK, CARD_RANKS, encode_card
+
+MAGIC = b"MAYI"
+# version 2 tables go down with two natural three of a kinds and wild cards to spare
+VERSION = 2
+HEADER = struct.Struct("<4sHHI")
+CAN_GO_DOWN = 1 << 15
+
+# the fewest cards giving each level, and the level for each card count (capped at 3)
+NATURAL_COSTS = (0, 2, 3)
+WILD_COSTS = (0, 1, 2)
+NATURAL_LEVELS = (0, 0, 1, 2)
+WILD_LEVELS = (0, 1, 2, 2)
+
+
+def level_costs(position):
+    return WILD_COSTS if position == WILD_RANK else NATURAL_COSTS
+
+
+def count_vectors(max_hand_size):
+    """ways[position][budget] is the number of level vectors for ranks position..12 using at most budget cards."""
+    ways = [[0] * (max_hand_size + 1) for _ in range(14)]
+    ways[13] = [1] * (max_hand_size + 1)
+    for position in range(12, -1, -1):
+        for budget in range(max_hand_size + 1):
+            ways[position][budget] = sum(ways[position + 1][budget - cost]
+                                         for cost in level_costs(position) if cost <= budget)
+    return ways
+
+
+def index_of(levels, ways, max_hand_size):
+    """Returns the level vector's index in the table, or None if it needs more than max_hand_size cards."""
+    index = 0
+    budget = max_hand_size
+    for position, level in enumerate(levels):
+        costs = level_costs(position)
+        if costs[level] > budget:
+            return None
+        for smaller_level in range(level):
+            if costs[smaller_level] <= budget:
+                index += ways[position + 1][budget - costs[smaller_level]]
+        budget -= costs[level]
+    return index
+
+
+def levels_of(counts):
+    return [WILD_LEVELS[min(count, 3)] if rank == WILD_RANK else NATURAL_LEVELS[min(count, 3)]
+            for rank, count in enumerate(counts)]
+
+
+def vectors(position, budget):
+    """Yields every level vector for ranks position..12 within the budget, in table order."""
+    if position == 13:
+        yield ()
+        return
+    costs = level_costs(position)
+    for level in range(3):
+        if costs[level] <= budget:
+            for rest in vectors(position + 1, budget - costs[level]):
+                yield (level,) + rest
+
+
+def build_table(path, max_hand_size=24):
+    entries = array("H")
+    for levels in vectors(0, max_hand_size):
+        counts = [level_costs(position)[level] for position, level in enumerate(levels)]
+        can_go_down, victory_ranks = VictoryConditions.two_three_of_a_kind_ranks(counts)
+        entries.append(victory_ranks | (CAN_GO_DOWN if can_go_down else 0))
+    if sys.byteorder != "little":
+        entries.byteswap()
+    with open(path, "wb") as table_file:
+        table_file.write(HEADER.pack(MAGIC, VERSION, max_hand_size, len(entries)))
+        entries.tofile(table_file)
+    return len(entries)
+
+
+class GoDownTable:
+    def __init__(self, path):
+        with open(path, "rb") as table_file:
+            self.mmap = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_hand_size, size = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} go-down table.")
+        if sys.byteorder != "little":
+            raise ValueError("Go-down tables can only be memory-mapped on little-endian machines.")
+        self.entries = memoryview(self.mmap)[HEADER.size:HEADER.size + 2 * size].cast("H")
+        self.ways = count_vectors(self.max_hand_size)
+
+    def close(self):
+        self.entries.release()
+        self.mmap.close()
+
+    def lookup(self, counts):
+        """Returns (can_go_down, victory_ranks) for the rank counts, or None if the table doesn't cover them."""
+        index = index_of(levels_of(counts), self.ways, self.max_hand_size)
+        if index is None:
+            return None
+        entry = self.entries[index]
+        return bool(entry & CAN_GO_DOWN), entry & ~CAN_GO_DOWN
+
+    def two_three_of_a_kind(self, cards, victory_cards):
+        """A drop-in replacement for VictoryConditions.two_three_of_a_kind that reads the table."""
+        counts = getattr(cards, "counts", None)
+        if counts is None:
+            return VictoryConditions.two_three_of_a_kind(cards, victory_cards)
+        result = self.lookup(counts)
+        if result is None:
+            return VictoryConditions.two_three_of_a_kind(cards, victory_cards)
+        victory_cards.empty()
+        can_go_down, victory_ranks = result
+        if victory_ranks:
+            victory_cards.add([card for card in cards.cards if victory_ranks >> CARD_RANKS[encode_card(card)] & 1])
+        return can_go_down
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the round 1 go-down lookup table.")
+    parser.add_argument("path")
+    parser.add_argument("--max-hand-size", type=int, default=24)
+    args = parser.parse_args()
+    size = build_table(args.path, args.max_hand_size)
+    print(f"Wrote {size} entries ({HEADER.size + 2 * size} bytes) to {args.path}")
+
+
+if __name__ == '__main__':
+    main()
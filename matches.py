@@ -0,0 +1,150 @@
+"""Plays headless seven-round matches across a process pool, streaming their results to a file of fixed-size records.
+
+A results file is a short header followed by one record per match, in little-endian order:
+
+    seed        the match's seed (uint64)
+    winners     each round's winning seat, 255 if the round hit the turn limit (one byte each)
+    points      each round's points per seat, round by round (uint16 each)
+
+Records are written as matches finish and read back a chunk at a time, so any number of matches can be aggregated in
+bounded memory. Seats score the points left in their hands each round, and the lowest total wins the match.
+"""
+import argparse
+import struct
+import time
+from collections import namedtuple
+from multiprocessing import Pool
+
+from src.main import Game
+
+MAGIC = b"MAYM"
+VERSION = 1
+HEADER = struct.Struct("<4sH")
+ROUNDS = 7
+SEATS = 5
+RECORD = struct.Struct(f"<Q{ROUNDS}B{ROUNDS * SEATS}H")
+NO_WINNER = 255
+
+# points is a tuple of rounds, each a tuple of the seats' points
+MatchRecord = namedtuple("MatchRecord", ["seed", "winners", "points"])
+
+
+def match_seed(seed, match_number):
+    return (seed << 32) | match_number
+
+
+def play_match(args):
+    """Plays a match, returning its packed record."""
+    seed, max_turns = args
+    game = Game(headless=True, seed=seed)
+    ledger = game.play_match(max_turns)
+    winners = [NO_WINNER if winner is None else winner for winner in game.round_winners]
+    return RECORD.pack(seed, *winners, *(seat_points for round_points in ledger for seat_points in round_points))
+
+
+def run_matches(matches, seed=0, processes=None, max_turns=1000, chunksize=16):
+    """Yields a packed record per match, in completion order."""
+    tasks = ((match_seed(seed, match_number), max_turns) for match_number in range(matches))
+    if processes == 1:
+        yield from map(play_match, tasks)
+        return
+    with Pool(processes) as pool:
+        yield from pool.imap_unordered(play_match, tasks, chunksize=chunksize)
+
+
+class MatchWriter:
+    """Appends match records to a binary file, writing them out in batches of buffer_size bytes."""
+
+    def __init__(self, file, buffer_size=1 << 16):
+        self.file = file
+        self.buffer_size = buffer_size
+        self.buffer = bytearray()
+        if not file.tell():
+            file.write(HEADER.pack(MAGIC, VERSION))
+
+    def write(self, record):
+        self.buffer += record
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_matches(file, chunk_size=1 << 16):
+    """Yields the MatchRecords in a results file, reading about chunk_size bytes at a time."""
+    magic, version = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Not a version {VERSION} match results file.")
+    chunk_size = max(1, chunk_size // RECORD.size) * RECORD.size
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            return
+        for fields in RECORD.iter_unpack(chunk):
+            points = fields[1 + ROUNDS:]
+            yield MatchRecord(fields[0], fields[1:1 + ROUNDS],
+                              tuple(points[start:start + SEATS] for start in range(0, len(points), SEATS)))
+
+
+def aggregate(matches):
+    """Aggregates a stream of MatchRecords, keeping only running totals.
+
+    Tied match winners each get the win.
+    """
+    count = 0
+    scores = [0] * SEATS
+    match_wins = [0] * SEATS
+    round_wins = [0] * SEATS
+    unfinished_rounds = 0
+    for record in matches:
+        count += 1
+        totals = [sum(round_points[seat_index] for round_points in record.points) for seat_index in range(SEATS)]
+        best = min(totals)
+        for seat_index, total in enumerate(totals):
+            scores[seat_index] += total
+            match_wins[seat_index] += total == best
+        for winner in record.winners:
+            if winner == NO_WINNER:
+                unfinished_rounds += 1
+            else:
+                round_wins[winner] += 1
+    return {"matches": count, "mean_scores": [score / count if count else 0.0 for score in scores],
+            "match_wins": match_wins, "round_wins": round_wins, "unfinished_rounds": unfinished_rounds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play headless seven-round matches to a results file, or "
+                                                 "summarize a results file.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    play_parser = subparsers.add_parser("play")
+    play_parser.add_argument("path")
+    play_parser.add_argument("--matches", type=int, default=1000)
+    play_parser.add_argument("--seed", type=int, default=0)
+    play_parser.add_argument("--processes", type=int, default=None, help="defaults to the number of cores")
+    play_parser.add_argument("--max-turns", type=int, default=1000)
+    summarize_parser = subparsers.add_parser("summarize")
+    summarize_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "play":
+        writer = MatchWriter(open(args.path, "ab"))
+        start = time.perf_counter()
+        for record in run_matches(args.matches, args.seed, args.processes, args.max_turns):
+            writer.write(record)
+        writer.close()
+        elapsed = time.perf_counter() - start
+        print(f"{args.matches} matches in {elapsed:.2f}s ({args.matches / elapsed:.1f} matches/s)")
+    else:
+        with open(args.path, "rb") as results_file:
+            for name, value in aggregate(read_matches(results_file)).items():
+                print(f"{name}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+"""An asyncio server hosting many concurrent May I tables, and a scripted client to load-test it.
+
+Clients connect over a Unix socket, and each connection plays the first seat at a table of its own against four AI
+seats. Messages are JSON objects, one per line. Cards are sent as card codes (see main.CARDS).
+
+The client sends one request per decision, each with an "op":
+
+    {"op": "draw", "from_discard_pile": false}
+    {"op": "go_down", "go_down": true}             when offered the chance to go down
+    {"op": "meld", "card": 3, "seat": 2}           a hand index, into the given seat's down cards, once down
+    {"op": "discard", "card": 0}                   a hand index
+
+The server answers with the seat's view of the table, {"type": "state", "prompt": ...}, where the prompt is the
+decision it is waiting for, or "over". Its "events" are the [kind, seat, card, argument] events the request caused,
+and those of the AI turns that followed it, with the cards other seats drew from the deck (including "May I"
+penalty cards) hidden. Bad requests get a {"type": "error"} message instead.
+
+AI turns run in a process pool, off the event loop: the table is sent to a worker as a checkpoint, the worker plays
+every AI seat up to the client's next turn, and the table is restored from the checkpoint it sends back.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.checkpoint import dumps, unpack_snapshot
+from src.main import Game, Events, CARD_RANKS, encode_cards
+
+EVENT_NAMES = {kind: name.lower() for name, kind in vars(Events).items() if name.isupper() and name != "TABLE"}
+
+DRAW = "draw"
+GO_DOWN = "go_down"
+DISCARD = "discard"
+OVER = "over"
+
+
+# each worker restores every checkpoint it's sent into the one game, rather than dealing a new game each time
+worker_game = None
+
+
+def play_ai_turns(args):
+    """Plays the AI seats from a checkpoint until it's the first seat's turn again, returning the checkpoint and the
+    events emitted along the way."""
+    global worker_game
+    checkpoint, seed, max_turns = args
+    if worker_game is None:
+        worker_game = Game(headless=True)
+    game = worker_game
+    game.restore(unpack_snapshot(checkpoint))
+    game.rng.seed(seed)
+    events = []
+    game.listeners = [events.append]
+    for seat_index, seat in enumerate(game.opponents, start=1):
+        if not game.playing or game.turns >= max_turns:
+            break
+        game.turns += 1
+        game.opponents_turn(seat_index, seat)
+        game.check_for_winner(seat)
+    return dumps(game), events
+
+
+class Table:
+    """A game with the first seat played by a client, and the rest by the AI."""
+
+    def __init__(self, table_id, seed, max_turns=1000):
+        self.table_id = table_id
+        self.game = Game(headless=True, seed=seed)
+        self.max_turns = max_turns
+        self.prompt = DRAW
+        self.events = []
+        self.game.listeners.append(self.events.append)
+
+    def handle(self, request):
+        """Applies the client's request, raising ValueError if it isn't allowed now.
+
+        Returns whether it ended the client's turn, in which case the AI seats are to play.
+        """
+        game = self.game
+        player = game.player
+        op = request.get("op")
+        if op != self.prompt and not (op == "meld" and self.prompt == DISCARD):
+            raise ValueError(f"Expected {self.prompt}, not {op}.")
+        if op == DRAW:
+            if request.get("from_discard_pile") and not game.discard_pile:
+                raise ValueError("The discard pile is empty.")
+            game.turns += 1
+            game.ai_draw(player, bool(request.get("from_discard_pile")))
+            self.prompt = GO_DOWN if game.can_go_down(player) else DISCARD
+        elif op == GO_DOWN:
+            game.ai_go_down(player, go_down=bool(request.get("go_down")))
+            if player.hand:
+                self.prompt = DISCARD
+            else:
+                game.check_for_winner(player)
+                self.prompt = OVER
+        elif op == "meld":
+            if not player.down:
+                raise ValueError("Only seats that are down can meld.")
+            card = player.hand[self.hand_index(request)]
+            down_cards = game.seats[self.seat_index(request)].down_cards
+            if not any(targets is down_cards for targets in game.meld_index.targets(card.code)):
+                raise ValueError("That card can't be melded into those down cards.")
+            game.meld(player, card, down_cards)
+            if not player.hand:
+                game.check_for_winner(player)
+                self.prompt = OVER
+        else:
+            game.discard(self.hand_index(request), player.hand)
+            game.check_for_winner(player)
+            self.prompt = OVER if not game.playing else DRAW
+            return game.playing
+        return False
+
+    def hand_index(self, request):
+        index = int(request.get("card"))
+        if not 0 <= index < len(self.game.player.hand):
+            raise ValueError(f"There is no card {index} in the hand.")
+        return index
+
+    def seat_index(self, request):
+        index = int(request.get("seat"))
+        if not 0 <= index < len(self.game.seats):
+            raise ValueError(f"There is no seat {index} at the table.")
+        return index
+
+    def ai_turns(self):
+        return dumps(self.game), self.game.rng.getrandbits(32), self.max_turns
+
+    def finish_ai_turns(self, checkpoint, events):
+        self.game.restore(unpack_snapshot(checkpoint))
+        self.events.extend(events)
+        if not self.game.playing or self.game.turns >= self.max_turns:
+            self.prompt = OVER
+
+    def state(self):
+        """Returns the first seat's view of the table, with the events since the last call."""
+        events = [(EVENT_NAMES[kind], seat_index, None if seat_index and hidden(kind, argument) else code, argument)
+                  for kind, seat_index, code, argument in self.events]
+        self.events.clear()
+        game = self.game
+        return {"type": "state", "table": self.table_id, "prompt": self.prompt, "events": events,
+                "hand": list(encode_cards(game.player.hand.cards)),
+                "discard_pile": list(encode_cards(game.discard_pile.cards))[-1:],
+                "down_cards": [list(encode_cards(seat.down_cards.cards)) for seat in game.seats],
+                "hand_sizes": [len(seat.hand) for seat in game.seats],
+                "deck_size": len(game.deck), "turns": game.turns,
+                "winner": None if game.winner is None else game.winner.seat_index}
+
+
+class Server:
+    """Hosts a table per connection, playing AI seats in a pool of processes (or inline, if processes is 0)."""
+
+    def __init__(self, processes=None, seed=None, max_turns=1000):
+        self.executor = ProcessPoolExecutor(processes) if processes != 0 else None
+        self.rng = random.Random(seed)
+        self.max_turns = max_turns
+        self.tables = {}
+        self.table_count = 0
+
+    async def serve(self, path):
+        return await asyncio.start_unix_server(self.handle_connection, path, backlog=1024)
+
+    async def handle_connection(self, reader, writer):
+        self.table_count += 1
+        table = Table(self.table_count, self.rng.getrandbits(64), self.max_turns)
+        self.tables[table.table_id] = table
+        try:
+            send(writer, table.state())
+            await writer.drain()
+            while table.prompt != OVER:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if table.handle(request):
+                        table.finish_ai_turns(*await self.play_ai_turns(table))
+                    send(writer, table.state())
+                except (ValueError, TypeError, AttributeError) as error:
+                    send(writer, {"type": "error", "message": str(error)})
+                await writer.drain()
+        finally:
+            del self.tables[table.table_id]
+            writer.close()
+
+    async def play_ai_turns(self, table):
+        if self.executor is None:
+            return play_ai_turns(table.ai_turns())
+        return await asyncio.get_running_loop().run_in_executor(self.executor, play_ai_turns, table.ai_turns())
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+def hidden(kind, argument):
+    """Whether the event's card is one only the seat it went to can see: a draw or penalty card from the deck."""
+    return (kind == Events.DRAW and not argument) or (kind == Events.MAY_I and argument)
+
+
+def send(writer, message):
+    writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+
+
+async def scripted_client(path, seed=None):
+    """Plays a game on the server at path with simple scripted moves, returning the final state and the seconds each
+    request took to answer."""
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_unix_connection(path)
+    latencies = []
+    state = None
+    try:
+        while True:
+            message = json.loads(await reader.readline())
+            if message["type"] == "error":
+                raise RuntimeError(message["message"])
+            if latencies:
+                latencies[-1] = time.perf_counter() - latencies[-1]
+            state = message
+            if state["prompt"] == OVER:
+                return state, latencies
+            if state["prompt"] == DRAW:
+                request = {"op": DRAW, "from_discard_pile": rng.random() < 0.2 and bool(state["discard_pile"])}
+            elif state["prompt"] == GO_DOWN:
+                request = {"op": GO_DOWN, "go_down": True}
+            else:
+                # discard a card of the rank the hand has fewest of, preferring to keep wild cards
+                hand_ranks = [CARD_RANKS[code] for code in state["hand"]]
+                index = min(range(len(hand_ranks)),
+                            key=lambda i: (not hand_ranks[i], hand_ranks.count(hand_ranks[i]), rng.random()))
+                request = {"op": DISCARD, "card": index}
+            latencies.append(time.perf_counter())
+            send(writer, request)
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def load_test(tables, processes=None, seed=0):
+    """Serves tables concurrent scripted clients from a temporary socket, returning their final states and latencies.
+    """
+    server = Server(processes, seed)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "may-i.sock")
+        unix_server = await server.serve(path)
+        try:
+            results = await asyncio.gather(*(scripted_client(path, seed=table) for table in range(tables)))
+        finally:
+            unix_server.close()
+            await unix_server.wait_closed()
+            server.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve May I tables on a Unix socket, or load-test the server.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve")
+    serve_parser.add_argument("path")
+    serve_parser.add_argument("--processes", type=int, default=None, help="defaults to the number of cores")
+    load_test_parser = subparsers.add_parser("load-test")
+    load_test_parser.add_argument("--tables", type=int, default=200)
+    load_test_parser.add_argument("--processes", type=int, default=None, help="defaults to the number of cores")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        async def serve():
+            server = Server(args.processes)
+            async with await server.serve(args.path) as unix_server:
+                await unix_server.serve_forever()
+        asyncio.run(serve())
+        return
+
+    start = time.perf_counter()
+    results = asyncio.run(load_test(args.tables, args.processes))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for state, table_latencies in results for latency in table_latencies)
+    print(f"{args.tables} tables in {elapsed:.2f}s, {len(latencies) / elapsed:.0f} requests/s")
+    print(f"latency: median {statistics.median(latencies) * 1000:.1f}ms, "
+          f"99th percentile {latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+from unittest import TestCase
+
+from src.benchmarks import BENCHMARKS, MACRO_BENCHMARKS, midgame, time_benchmark, load_baseline, regressions
+
+
+class TestBenchmarks(TestCase):
+    def test_benchmarks_leave_the_game_unchanged(self):
+        game = midgame()
+        snapshot = game.snapshot()
+        for benchmark in list(BENCHMARKS.values()) + list(MACRO_BENCHMARKS.values()):
+            self.assertGreater(time_benchmark(benchmark, game, number=1, repeat=1), 0)
+            self.assertEqual(snapshot, game.snapshot())
+
+    def test_baseline_covers_every_benchmark(self):
+        self.assertEqual(set(BENCHMARKS) | set(MACRO_BENCHMARKS), set(load_baseline()))
+
+    def test_regressions(self):
+        baseline = {"setup": 100.0, "discard": 10.0}
+        timings = {"setup": 120.0, "discard": 13.0, "new": 1000.0}
+        self.assertEqual(["discard"], regressions(timings, baseline, threshold=0.25))
+        self.assertEqual([], regressions(timings, baseline, threshold=0.5))
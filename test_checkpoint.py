@@ -0,0 +1,64 @@
+from io import BytesIO
+from unittest import TestCase
+
+from pydealer import Card
+
+from src.checkpoint import dumps, loads, dump, load, pack_snapshot, unpack_snapshot, HEADER, SEAT
+from src.main import Game
+
+
+class TestCheckpoint(TestCase):
+    def setUp(self) -> None:
+        self.game = Game(headless=True, seed=3)
+        self.game.play_headless(max_turns=5)
+
+    def test_round_trip(self):
+        data = dumps(self.game)
+        # one byte per card, counting victory cards again as they're also down cards
+        card_count = 104 + sum(len(seat.victory_cards) for seat in self.game.seats)
+        meld_group_count = sum(map(len, self.game.meld_index.groups.values()))
+        meld_sequence_count = len(self.game.meld_index.sequences)
+        self.assertEqual(HEADER.size + 5 * SEAT.size + card_count + 2 * meld_group_count + 4 * meld_sequence_count,
+                         len(data))
+        resumed = loads(data)
+        self.assertEqual(self.game.snapshot()._replace(rng_state=None), resumed.snapshot()._replace(rng_state=None))
+        self.assertEqual(data, dumps(resumed))
+        self.assertEqual(set(self.game.meld_index.groups), resumed.all_down_card_values)
+
+    def test_match_and_sequences_round_trip(self):
+        game = Game(headless=True, seed=1)
+        game.deal(3, 2)
+        game.scores = [300, 0, 25, 1000, 7]
+        game.play_headless(max_turns=1000)
+        self.assertTrue(game.meld_index.sequences)
+        resumed = loads(dumps(game))
+        self.assertEqual((2, [300, 0, 25, 1000, 7]), (resumed.dealer, resumed.scores))
+        self.assertEqual(game.snapshot()._replace(rng_state=None), resumed.snapshot()._replace(rng_state=None))
+
+    def test_file_round_trip(self):
+        file = BytesIO()
+        dump(self.game, file)
+        file.seek(0)
+        self.assertEqual(dumps(self.game), dumps(load(file)))
+
+    def test_resumed_game_plays_on_identically(self):
+        resumed = loads(dumps(self.game), seed=9)
+        self.game.rng.seed(9)
+        winner = self.game.play_headless()
+        self.assertEqual(self.game.seats.index(winner), resumed.seats.index(resumed.play_headless()))
+        self.assertEqual(dumps(self.game), dumps(resumed))
+
+    def test_fixture(self):
+        snapshot = Game(headless=True).snapshot()
+        player = snapshot.seats[0]._replace(hand=(Card('3', 'Spades'),))
+        fixture = snapshot._replace(seats=(player,) + snapshot.seats[1:])
+        game = loads(pack_snapshot(fixture))
+        self.assertEqual([Card('3', 'Spades')], list(game.hand))
+        self.assertEqual(1, game.hand.counts[1])
+
+    def test_rejects_other_data(self):
+        data = dumps(self.game)
+        with self.assertRaises(ValueError):
+            unpack_snapshot(b"MAYI" + data[4:])
+        with self.assertRaises(ValueError):
+            unpack_snapshot(data + b"\0")
@@ -0,0 +1,71 @@
+from unittest import TestCase
+
+from src.discard import RUN_OUTS, DiscardScorer, ExpectedValuePolicy, completion_probability, discard_scores
+from src.main import Game
+from src.tracker import UnseenTracker
+
+
+class TestOuts(TestCase):
+    def test_run_outs(self):
+        # a low Ace held, so the 3 and 4 are outs, and the 2's position takes a wild card, counted separately
+        self.assertEqual((14, 15), RUN_OUTS[1][0][0b0001])
+        self.assertEqual((1, 2, 3), RUN_OUTS[0][1][0b0000])
+        # the Jack to Ace window, holding the Queen and King
+        self.assertEqual((9, 12), RUN_OUTS[0][10][0b0110])
+
+    def test_completion_probability(self):
+        self.assertEqual(1, completion_probability(0, 0, 104))
+        self.assertAlmostEqual(8 / 104, completion_probability(1, 8, 104, 1))
+        self.assertAlmostEqual((8 / 104) * (7 / 103), completion_probability(2, 8, 104, 2))
+        self.assertEqual(0, completion_probability(2, 1, 104))
+
+
+class TestDiscardScorer(TestCase):
+    def setUp(self) -> None:
+        self.tracker = UnseenTracker(0)
+
+    def scores(self, codes, three_of_a_kinds=2, sequences=0, **kwargs):
+        return DiscardScorer(three_of_a_kinds, sequences).scores(codes, self.tracker.unseen, self.tracker.rank_unseen,
+                                                                 self.tracker.total, **kwargs)
+
+    def test_keeps_the_sets(self):
+        # three 7s, two Kings and a 4
+        scores = self.scores([5, 18, 31, 11, 24, 2])
+        self.assertEqual(5, scores.index(min(scores)))
+        self.assertEqual(scores[0], scores[1])
+
+    def test_keeps_the_run(self):
+        # the 3 to 6 of a suit, and a 9
+        scores = self.scores([14, 15, 16, 17, 33], three_of_a_kinds=0, sequences=1)
+        self.assertEqual(0, scores[4])
+        self.assertTrue(all(score > 0 for score in scores[:4]))
+
+    def test_down_sheds_points(self):
+        # a 4, a King and an Ace, with Aces meldable
+        scores = self.scores([2, 11, 12], down=True, meldable={12})
+        self.assertEqual([10, 4, 14], scores)
+
+    def test_feeding(self):
+        feeding = [0.0] * 13
+        feeding[0] = 1.0
+        self.assertEqual(10, self.scores([0, 2], down=True, feeding=feeding)[0] - self.scores([0, 2], down=True)[0])
+
+    def test_hand_of_the_game(self):
+        game = Game(headless=True, seed=1)
+        self.assertEqual(len(game.hand), len(discard_scores(game, game.player)))
+
+
+class TestExpectedValuePolicy(TestCase):
+    def test_does_not_discard_the_card_it_took(self):
+        game = Game(headless=True, seed=1)
+        policy = ExpectedValuePolicy()
+        best = policy.discard_index(game, game.player)
+        policy.taken = game.hand.cards[best]
+        self.assertNotEqual(best, policy.discard_index(game, game.player))
+
+    def test_plays_games(self):
+        for seed in range(10):
+            game = Game(headless=True, seed=seed)
+            game.player.policy = ExpectedValuePolicy()
+            game.play_headless()
+            self.assertFalse(game.playing)
@@ -0,0 +1,91 @@
+from io import BytesIO
+from unittest import TestCase
+
+from src.events import EventWriter, read_events, read_games, replay, summarize, Event
+from src.main import Game, Events
+
+
+def table(game):
+    """Everything on the table, ignoring the order of held cards and which of the two copies of a card is where."""
+    stacks = [game.discard_pile] + [seat.hand for seat in game.seats] + [seat.down_cards for seat in game.seats]
+    return ([sorted(card.code % 52 for card in stack.cards) for stack in stacks],
+            [card.code for card in game.discard_pile],
+            sorted(code % 52 for code in game.deck.codes[:game.deck.size]),
+            game.turns, game.winner and game.seats.index(game.winner),
+            game.snapshot().meld_groups, game.snapshot().meld_sequences)
+
+
+class TestEvents(TestCase):
+    def setUp(self) -> None:
+        self.log = BytesIO()
+        writer = EventWriter(self.log)
+        self.games = [Game(headless=True, seed=seed) for seed in range(10)]
+        # some games in a round with "May I" claims
+        for game in self.games[::2]:
+            game.round = 4
+        # and some with sequences
+        for game in self.games[1::4]:
+            game.round = 6
+        self.games[3].round = 3
+        for game in self.games:
+            writer.record(game)
+            game.play_headless()
+        writer.flush()
+        self.log.seek(0)
+
+    def test_replay(self):
+        replayed_games = [replay(game_events) for game_events in read_games(read_events(self.log, chunk_size=10))]
+        self.assertEqual(list(map(table, self.games)), list(map(table, replayed_games)))
+
+    def test_replay_recorded_down_cards(self):
+        game = Game(headless=True, seed=2)
+        game.deal(6, 0)
+        game.play_headless(max_turns=1000)
+        self.assertTrue(game.meld_index.sequences)
+        log = BytesIO()
+        writer = EventWriter(log)
+        writer.record(game)
+        writer.flush()
+        log.seek(0)
+        replayed = replay(next(read_games(read_events(log))))
+        # the recorded state has the cards and melds, but not the turns played or the winner
+        self.assertEqual(table(game)[:3] + table(game)[5:], table(replayed)[:3] + table(replayed)[5:])
+
+    def test_record_a_match(self):
+        game = Game(headless=True, seed=4)
+        log = BytesIO()
+        writer = EventWriter(log)
+        writer.record(game)
+        game.play_match()
+        writer.flush()
+        log.seek(0)
+        # each deal starts a game, with no game for the state before the first
+        games = list(read_games(read_events(log)))
+        self.assertEqual(list(game.rounds), [game_events[0].argument for game_events in games])
+        self.assertEqual(table(game), table(replay(games[-1])))
+
+    def test_events(self):
+        events = list(read_events(self.log))
+        self.assertEqual(Event(Events.GAME, Events.TABLE, 0, 4), events[0])
+        self.assertEqual([Events.DEAL] * 56, [event.kind for event in events[1:57]])
+        self.assertEqual(Events.TABLE, events[56].seat)
+
+    def test_summarize(self):
+        summary = summarize(read_events(self.log))
+        self.assertEqual(10, summary["games"])
+        self.assertEqual(sum(game.turns for game in self.games), summary["turns"])
+        self.assertEqual(sum(game.winner is not None for game in self.games), summary["finished"])
+        self.assertEqual(sum(seat.claims for game in self.games for seat in game.seats), summary["may_i_claims"])
+        self.assertGreater(summary["may_i_claims"], 0)
+
+    def test_appending_to_a_log(self):
+        self.log.seek(0, 2)
+        writer = EventWriter(self.log)
+        writer.record(Game(headless=True))
+        writer.flush()
+        self.log.seek(0)
+        self.assertEqual(11, summarize(read_events(self.log))["games"])
+
+    def test_rejects_other_files(self):
+        with self.assertRaises(ValueError):
+            next(read_events(BytesIO(b"MAYI\1\0")))
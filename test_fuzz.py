@@ -0,0 +1,59 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from src.fuzz import EVALUATORS, Failure, check, fuzz, fuzz_shard, oracle, shrink
+
+
+class TestOracle(TestCase):
+    def test_three_of_a_kinds(self):
+        # the 5s of three suits and the 9s of two, with a wild card
+        self.assertTrue(oracle([3, 16, 29, 7, 20, 0], 2, 0))
+        self.assertFalse(oracle([3, 16, 29, 7, 20], 2, 0))
+        # a single 9 can't make a three of a kind with two wild cards
+        self.assertFalse(oracle([3, 16, 29, 7, 0, 13], 2, 0))
+        # both copies of the 5 of a suit, with a third 5
+        self.assertTrue(oracle([3, 55, 16], 1, 0))
+        # three of a kinds are of different ranks
+        self.assertFalse(oracle([3, 16, 29, 55, 68, 81], 2, 0))
+
+    def test_sequences(self):
+        # the 3 to 6 of a suit
+        self.assertTrue(oracle([1, 2, 3, 4], 0, 1))
+        # the Ace plays low, with a wild card in the 2's position, or high
+        self.assertTrue(oracle([12, 1, 2, 26], 0, 1))
+        self.assertTrue(oracle([9, 10, 11, 12], 0, 1))
+        self.assertFalse(oracle([10, 11, 12, 1], 0, 1))
+        # wild cards can't outnumber natural cards
+        self.assertTrue(oracle([1, 3, 0, 13], 0, 1))
+        self.assertFalse(oracle([1, 0, 13, 26], 0, 1))
+        # two sequences from both copies of the cards
+        self.assertTrue(oracle([1, 2, 3, 4, 53, 54, 55, 56], 0, 2))
+        self.assertFalse(oracle([1, 2, 3, 4, 53, 54, 55], 0, 2))
+
+    def test_contracts_share_no_cards(self):
+        # the 3 to 6 of a suit, and two more 6s
+        self.assertFalse(oracle([1, 2, 3, 4, 17, 30], 1, 1))
+        self.assertTrue(oracle([1, 2, 3, 4, 17, 30, 56], 1, 1))
+
+
+class TestFuzz(TestCase):
+    def test_evaluators_agree_with_the_oracle(self):
+        checked, failures = fuzz_shard((0, 0, 300))
+        self.assertEqual(300, checked)
+        self.assertEqual([], failures)
+
+    def test_shards(self):
+        self.assertEqual([(100, []), (50, [])], list(fuzz(150, seed=2, processes=1, shard_size=100)))
+
+    def test_shrink(self):
+        def wild_blind(round_number, codes):
+            # an evaluator that never goes down holding a wild card
+            return oracle(codes, 2, 0) and 0 not in [code % 13 for code in codes]
+
+        # the 5s of three suits and the 9s of two with a wild card, and some other cards
+        codes = (3, 16, 29, 7, 20, 0, 11, 25, 44, 60)
+        with patch.dict(EVALUATORS, {"wild blind": wild_blind}):
+            failure = check(1, codes, {"wild blind": wild_blind})
+            self.assertEqual(Failure(1, codes, "wild blind", True), failure)
+            shrunk = shrink(failure)
+        self.assertEqual(Failure(1, (0, 3, 7, 16, 20, 29), "wild blind", True), shrunk)
@@ -0,0 +1,62 @@
+import json
+from unittest import TestCase
+
+from src.instrumentation import LatencyHistogram, instrument, uninstrument, VICTORY_CHECK
+from src.main import Game, HeuristicPolicy
+
+
+class TestLatencyHistogram(TestCase):
+    def test_percentile(self):
+        histogram = LatencyHistogram()
+        for ns in [100] * 98 + [5000, 9000]:
+            histogram.record(ns)
+        self.assertEqual(100, histogram.calls)
+        self.assertEqual(9000, histogram.max_ns)
+        self.assertEqual(128, histogram.percentile(0.5))
+        self.assertEqual(8192, histogram.percentile(0.99))
+        self.assertEqual(9000, histogram.percentile(1))
+
+
+class TestInstrumentation(TestCase):
+    def test_records_a_game(self):
+        game = Game(headless=True, seed=0)
+        instrumentation = instrument(game)
+        game.play_headless()
+        histograms = instrumentation.histograms
+        self.assertEqual(game.turns, histograms["opponents_turn"].calls)
+        self.assertEqual(game.turns, histograms["check_for_winner"].calls)
+        self.assertEqual(game.turns, histograms["policy.draw_from_discard_pile"].calls)
+        self.assertIn(VICTORY_CHECK, histograms)
+        self.assertEqual(1, instrumentation.counters["WIN"])
+        snapshot = json.loads(json.dumps(instrumentation.snapshot()))
+        self.assertEqual(game.turns, snapshot["phases"]["opponents_turn"]["calls"])
+        self.assertIn("opponents_turn", instrumentation.summary())
+
+    def test_plays_the_same_game(self):
+        game = Game(headless=True, seed=3)
+        instrument(game)
+        game.play_headless()
+        uninstrumented = Game(headless=True, seed=3)
+        uninstrumented.play_headless()
+        self.assertEqual(uninstrumented.snapshot(), game.snapshot())
+
+    def test_uninstrument(self):
+        game = Game(headless=True, seed=0)
+        rounds = game.rounds
+        instrumentation = instrument(game)
+        uninstrument(game)
+        self.assertIs(Game, type(game))
+        self.assertTrue(all(type(seat.policy) is HeuristicPolicy for seat in game.seats))
+        self.assertIs(rounds, game.rounds)
+        self.assertEqual([], game.listeners)
+        game.play_headless()
+        self.assertEqual({}, instrumentation.histograms)
+
+    def test_clones_record_into_the_same_instrumentation(self):
+        game = Game(headless=True, seed=0)
+        instrumentation = instrument(game)
+        snapshot = game.snapshot()
+        clone = game.clone()
+        clone.opponents_turn(0, clone.player)
+        self.assertEqual(1, instrumentation.histograms["opponents_turn"].calls)
+        self.assertEqual(snapshot, game.snapshot())
@@ -0,0 +1,56 @@
+import random
+from unittest import TestCase
+
+from src.ismcts import ISMCTSPolicy, determinize, seat_view
+from src.main import Game, encode_card, encode_cards
+from src.tracker import UnseenTracker
+
+
+class TestISMCTS(TestCase):
+    def setUp(self) -> None:
+        self.game = Game(headless=True, seed=3)
+
+    def test_determinize_keeps_what_the_seat_can_see(self):
+        opponent = self.game.opponents[1]
+        view = seat_view(self.game, opponent)
+        sample = determinize(view, random.Random(0))
+        self.assertEqual(view.hand, encode_cards(sample.opponents[1].hand.cards))
+        self.assertEqual(view.discard_pile, encode_cards(sample.discard_pile.cards))
+        self.assertEqual(view.hand_sizes, tuple(len(seat.hand) for seat in sample.seats))
+        all_cards = b"".join([encode_cards(seat.hand.cards) for seat in sample.seats]
+                             + [encode_cards(sample.deck.cards), encode_cards(sample.discard_pile.cards)])
+        self.assertEqual(list(range(104)), sorted(all_cards))
+
+    def test_determinize_pins_known_pickups(self):
+        tracker = UnseenTracker.from_game(self.game, self.game.player)
+        seat = self.game.opponents[0]
+        card = encode_card(self.game.discard_pile[len(self.game.discard_pile) - 1]) % 52
+        self.game.ai_draw(seat, True)
+        view = seat_view(self.game, self.game.player, tracker)
+        self.assertEqual((card,), view.known[1])
+        rng = random.Random(0)
+        game = Game(headless=True)
+        for _ in range(20):
+            sample = determinize(view, rng, game)
+            self.assertIs(game, sample)
+            self.assertIn(card, [code % 52 for code in encode_cards(sample.seats[1].hand.cards)])
+            all_cards = b"".join([encode_cards(seat.hand.cards) for seat in sample.seats]
+                                 + [encode_cards(sample.deck.cards), encode_cards(sample.discard_pile.cards)])
+            self.assertEqual(list(range(104)), sorted(all_cards))
+
+    def test_plays_a_game(self):
+        policy = ISMCTSPolicy(time_budget=0.001, seed=0)
+        self.game.opponents[0].policy = policy
+        self.game.play_headless()
+        self.assertFalse(self.game.playing)
+        self.assertGreater(policy.rollouts, 0)
+        self.assertGreater(policy.rollouts_per_second, 0)
+
+    def test_root_parallel_search(self):
+        policy = ISMCTSPolicy(time_budget=0.01, processes=2, seed=0)
+        try:
+            index = policy.discard_index(self.game, self.game.player)
+        finally:
+            policy.close()
+        self.assertIn(index, range(len(self.game.hand)))
+        self.assertGreaterEqual(policy.rollouts, 2 * len(set(card.name for card in self.game.hand.cards)))
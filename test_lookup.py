@@ -0,0 +1,44 @@
+import os
+import random
+import tempfile
+from unittest import TestCase
+
+from pydealer import Stack
+
+from src.lookup import GoDownTable, build_table, count_vectors, index_of, vectors
+from src.main import VictoryConditions, Hand, decode_cards, rank_counts
+
+
+class TestLookup(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, "go_down.table")
+        cls.size = build_table(cls.path, max_hand_size=12)
+        cls.table = GoDownTable(cls.path)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.table.close()
+        cls.directory.cleanup()
+
+    def test_index_is_a_minimal_perfect_hash(self):
+        ways = count_vectors(12)
+        indices = [index_of(levels, ways, 12) for levels in vectors(0, 12)]
+        self.assertEqual(list(range(self.size)), indices)
+
+    def test_lookup_matches_scalar(self):
+        rng = random.Random(0)
+        for _ in range(2000):
+            counts = rank_counts(bytes(rng.sample(range(104), rng.randint(0, 12))))
+            self.assertEqual(VictoryConditions.two_three_of_a_kind_ranks(counts), self.table.lookup(counts))
+
+    def test_lookup_beyond_max_hand_size(self):
+        self.assertIsNone(self.table.lookup([2, 3, 3, 3, 3, 0, 0, 0, 0, 0, 0, 0, 0]))
+
+    def test_two_three_of_a_kind_drop_in(self):
+        hand = Hand(cards=decode_cards(bytes([1, 14, 27, 2, 15, 28, 0, 40])))
+        victory_cards, expected_victory_cards = Stack(), Stack()
+        self.assertEqual(VictoryConditions.two_three_of_a_kind(hand, expected_victory_cards),
+                         self.table.two_three_of_a_kind(hand, victory_cards))
+        self.assertEqual(expected_victory_cards, victory_cards)
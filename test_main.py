@@ -1,10 +1,15 @@
 from collections import deque, Counter
+from io import StringIO
+from random import Random
 from unittest import TestCase
 from unittest.mock import patch
 
 from pydealer import Card, Stack, VALUES
 
-from src.main import VictoryConditions, Game, get_points, auto_select_down_cards
+from src.main import VictoryConditions, Game, get_points, auto_select_down_cards, encode_cards, decode_cards, \
+    rank_counts, CARDS, Hand, solve_go_down, Renderer, get_formatted_card_string, Shoe, ScriptedPlayer, AIPlayer, \
+    Events, Style, StylePolicy, Opponent, BColors, GoDownSolver, Player, encode_card, sequence_span, open_ends
+from src.fuzz import ROUNDS, contract_oracle, random_hand, adversarial_hand
 
 all_spades = [Card(value, 'spades') for value in VALUES]
 
@@ -23,6 +28,13 @@ def wild_three_of_a_kind(value):
             Card(value, 'hearts')]
 
 
+def put_down(game, seat, *groups):
+    """Puts the groups of cards into the seat's down cards, as if it had gone down with them."""
+    for group in groups:
+        seat.down_cards.add(group)
+    game.register_down_cards(seat, groups)
+
+
 class TestVictoryConditions(TestCase):
     def setUp(self) -> None:
         self.game = Game()
@@ -37,6 +49,14 @@ class TestVictoryConditions(TestCase):
         self.game.hand.add(three_of_a_kind(4))
         self.assertTrue(VictoryConditions.two_three_of_a_kind(self.game.hand.cards, self.game.victory_cards))
 
+    def test_two_three_of_a_kind_both_natural_with_a_wild_card(self):
+        """Test two natural three of a kinds, with a wild card to spare."""
+        self.game.hand.add(three_of_a_kind(3))
+        self.game.hand.add(three_of_a_kind(4))
+        self.game.hand.add(Card(value='2', suit='Spades'))
+        self.assertTrue(VictoryConditions.two_three_of_a_kind(self.game.hand, self.game.victory_cards))
+        self.assertEqual(6, len(self.game.victory_cards))
+
     def test_two_three_of_a_kind_one_natural_one_wild(self):
         """Test one natural three of a kind, and one wild with a deuce."""
         self.game.hand.add(three_of_a_kind(3))
@@ -102,6 +122,172 @@ class TestVictoryConditions(TestCase):
         self.assertFalse(VictoryConditions.two_three_of_a_kind(self.game.hand.cards, self.game.victory_cards))
 
 
+    def test_two_sequences_ace_low_and_wild(self):
+        """Test an Ace low sequence with a deuce filling the gap, and a natural King high sequence."""
+        self.game.hand.add([Card('Ace', 'Spades'), Card('2', 'Hearts'), Card('3', 'Spades'), Card('4', 'Spades')])
+        self.game.hand.add([Card(value, 'Clubs') for value in ['9', '10', 'Jack', 'Queen']])
+        self.game.hand.add(Card('7', 'Diamonds'))
+        self.assertTrue(VictoryConditions.two_sequences(self.game.hand, self.game.victory_cards))
+        self.assertEqual(8, len(self.game.victory_cards))
+        self.assertNotIn(Card('7', 'Diamonds'), self.game.victory_cards.cards)
+
+    def test_three_sequences_with_duplicates(self):
+        """Test two sequences in the same suit using both decks, and an Ace high."""
+        self.game.hand.add([Card(value, 'Spades') for value in ['Jack', 'Queen', 'King', 'Ace']] * 2)
+        self.assertFalse(VictoryConditions.three_sequences(self.game.hand, self.game.victory_cards))
+        self.game.hand.add([Card('3', 'Hearts'), Card('4', 'Hearts'), Card('2', 'Clubs'), Card('2', 'Clubs')])
+        self.assertTrue(VictoryConditions.three_sequences(self.game.hand, self.game.victory_cards))
+
+    def test_sequence_wild_cards_cannot_outnumber_natural_cards(self):
+        self.game.hand.add([Card('5', 'Spades'), Card('2', 'Hearts'), Card('2', 'Clubs'), Card('2', 'Diamonds')])
+        self.assertFalse(VictoryConditions.two_sequences(self.game.hand, self.game.victory_cards))
+
+    def test_three_of_a_kind_and_sequence_sharing_a_rank(self):
+        """The 8 of spades can't be in both the sequence and the three of a kind, unless a deuce takes its place."""
+        self.game.hand.add([Card(value, 'Spades') for value in ['5', '6', '7', '8']])
+        self.game.hand.add([Card('8', 'Hearts'), Card('8', 'Clubs')])
+        self.assertFalse(VictoryConditions.three_of_a_kind_and_sequence(self.game.hand, self.game.victory_cards))
+        self.game.hand.add(Card('2', 'Clubs'))
+        self.assertTrue(VictoryConditions.three_of_a_kind_and_sequence(self.game.hand, self.game.victory_cards))
+        self.assertEqual(7, len(self.game.victory_cards))
+
+    def test_three_three_of_a_kind(self):
+        self.game.hand.add(three_of_a_kind(3))
+        self.game.hand.add(three_of_a_kind(4))
+        self.game.hand.add(wild_three_of_a_kind(5))
+        self.assertTrue(VictoryConditions.three_three_of_a_kind(self.game.hand, self.game.victory_cards))
+        self.assertEqual(9, len(self.game.victory_cards))
+
+
+class TestGoDownSolver(TestCase):
+    def test_fewest_points_left(self):
+        """With three three of a kinds and two deuces, the threes (the fewest points) are left in hand."""
+        hand = three_of_a_kind(3) + three_of_a_kind(4) + three_of_a_kind(5)[:2] + [Card('2', 'Spades')]
+        groups = solve_go_down(hand, 2, 0)
+        self.assertEqual([three_of_a_kind(4), three_of_a_kind(5)[:2] + [Card('2', 'Spades')]], groups)
+
+    def test_sequence_extends_past_four_cards(self):
+        hand = [Card(value, 'Hearts') for value in ['9', '10', 'Jack', 'Queen', 'King', 'Ace']] + three_of_a_kind(7)
+        groups = solve_go_down(hand, 1, 1)
+        self.assertEqual(hand, groups[0] + groups[1])
+
+    def test_cannot_go_down(self):
+        self.assertIsNone(solve_go_down(all_spades, 2, 0))
+        self.assertIsNone(solve_go_down(three_of_a_kind(3) + three_of_a_kind(4), 1, 1))
+
+    def test_leaves_natural_cards_out_of_sequences(self):
+        # W-8-W-10 and 9-10-W-W of hearts need the second 10 of hearts out of the first sequence
+        groups = GoDownSolver(0, 2, node_budget=10 ** 9).solve(decode_cards([12, 13, 26, 32, 33, 34, 38, 39, 78, 86]))
+        self.assertEqual(2, len(groups))
+
+    def test_agrees_with_the_oracle(self):
+        rng = Random(0)
+        for round_number, contract in ROUNDS.items():
+            for hand_number in range(150):
+                codes = adversarial_hand(rng) if hand_number % 2 else random_hand(rng)
+                groups = solve_go_down(decode_cards(codes), contract["three_of_a_kinds"], contract["sequences"])
+                self.assertEqual(contract_oracle(round_number, codes), groups is not None, (round_number, codes))
+                if groups is not None:
+                    self.assertTrue(contract_oracle(round_number, encode_cards(card for group in groups
+                                                                               for card in group)))
+
+    def test_out_of_budget(self):
+        hand = decode_cards([12, 13, 26, 32, 33, 34, 38, 39, 78, 86])
+        self.assertIsNotNone(GoDownSolver(0, 2, node_budget=1).solve(hand))
+        self.assertIsNone(GoDownSolver(2, 0, node_budget=1).solve(all_spades))
+
+
+class TestCardEncoding(TestCase):
+    def test_encode_decode_round_trip(self):
+        codes = encode_cards(CARDS)
+        self.assertEqual(bytes(range(104)), codes)
+        self.assertEqual(list(CARDS), decode_cards(codes))
+
+    def test_encode_unshared_cards(self):
+        """Cards built outside the deck encode as the first deck's copy."""
+        cards = [Card('2', 'Diamonds'), Card('Ace', 'Spades')]
+        self.assertEqual(encode_cards([CARDS[0], CARDS[51]]), encode_cards(cards))
+        self.assertEqual(51, encode_card(cards[1]))
+        # and are left as they were
+        self.assertFalse(any(hasattr(card, "code") for card in cards))
+
+    def test_two_three_of_a_kind_ranks(self):
+        counts = rank_counts(encode_cards(three_of_a_kind(3) + wild_three_of_a_kind(4)))
+        self.assertEqual((True, 0b111), VictoryConditions.two_three_of_a_kind_ranks(counts))
+        self.assertEqual((False, 0), VictoryConditions.two_three_of_a_kind_ranks(rank_counts(b'')))
+
+
+class TestHand(TestCase):
+    def assertCounted(self, hand):
+        self.assertEqual(rank_counts(encode_cards(hand.cards)), hand.counts)
+        self.assertEqual(get_points(list(hand.cards)), hand.points)
+
+    def test_counts_follow_changes(self):
+        hand = Hand(cards=three_of_a_kind(3))
+        self.assertCounted(hand)
+        hand.add(wild_three_of_a_kind(4))
+        hand.add(Card('Ace', 'Spades'))
+        hand.add(Stack(cards=all_spades))
+        self.assertEqual(2, hand.wild_count)
+        self.assertCounted(hand)
+        hand.remove(Card('3', 'Hearts'))
+        hand.pop(0)
+        del hand[-1]
+        hand.deal(3)
+        hand.sort()
+        self.assertCounted(hand)
+        hand.empty()
+        self.assertEqual([0] * 13, hand.counts)
+        self.assertEqual(0, hand.points)
+
+    def test_counts_follow_inserts_and_random_cards(self):
+        hand = Hand(cards=three_of_a_kind(3))
+        hand.insert(Card('Ace', 'Spades'))
+        hand.insert(Card('2', 'Clubs'), 0)
+        hand.insert_list(wild_three_of_a_kind(4), 2)
+        hand.insert_list([Card('King', 'Hearts')])
+        self.assertEqual(Card('2', 'Clubs'), hand[0])
+        self.assertEqual(wild_three_of_a_kind(4), list(hand.cards)[2:5])
+        self.assertEqual(Card('King', 'Hearts'), hand[-1])
+        self.assertCounted(hand)
+        hand.random_card(remove=True)
+        self.assertEqual(8, len(hand))
+        self.assertCounted(hand)
+        self.assertIn(hand.random_card(), hand.cards)
+        self.assertEqual(8, len(hand))
+
+
+class TestShoe(TestCase):
+    def test_seeded_shuffle(self):
+        self.assertEqual(Shoe(Random(5)).codes, Shoe(Random(5)).codes)
+        self.assertEqual(list(range(104)), sorted(Shoe(Random(5)).codes))
+
+    def test_deal(self):
+        shoe = Shoe()
+        top_cards = decode_cards(reversed(shoe.codes[-3:]))
+        self.assertEqual(top_cards, shoe.deal(3))
+        self.assertEqual(101, len(shoe))
+        self.assertEqual(101, len(shoe.deal(200)))
+        self.assertEqual([], shoe.deal())
+        self.assertFalse(shoe)
+
+
+class TestRenderer(TestCase):
+    def test_only_changed_sections_are_written(self):
+        stream = StringIO()
+        renderer = Renderer(stream)
+        self.assertEqual(2, renderer.render([("hand", "A\n"), ("discard_pile", "B\n")]))
+        self.assertEqual(1, renderer.render([("hand", "C\n"), ("discard_pile", "B\n")]))
+        self.assertEqual(0, renderer.render([("hand", "C\n"), ("discard_pile", "B\n")]))
+        renderer.invalidate()
+        self.assertEqual(2, renderer.render([("hand", "C\n"), ("discard_pile", "B\n")]))
+        self.assertEqual("A\nB\nC\nC\nB\n", stream.getvalue())
+
+    def test_formatted_card_strings(self):
+        self.assertEqual("♠ Ace of Spades", get_formatted_card_string(Card('Ace', 'Spades')))
+        self.assertEqual("3: \033[91m♥ 10 of Hearts\033[0m", get_formatted_card_string(Card('10', 'Hearts'), 3))
+
+
 class TestGame(TestCase):
     def setUp(self) -> None:
         self.game = Game()
@@ -155,6 +341,44 @@ class TestGame(TestCase):
         self.game.go_down()
         self.assertEqual(three_of_a_kind(5), self.game.hand)
 
+    @patch('builtins.print')
+    def test_go_down_scripted_select(self, mock_print):
+        self.game.player_input = ScriptedPlayer(['1', '2'])
+        self.game.hand.add(three_of_a_kind(3))
+        self.game.hand.add(three_of_a_kind(4))
+        self.game.hand.add(three_of_a_kind(5))
+        VictoryConditions.two_three_of_a_kind(self.game.hand.cards, self.game.victory_cards)
+        self.game.go_down()
+        self.assertEqual(three_of_a_kind(3), self.game.hand)
+        with self.assertRaises(IndexError):
+            self.game.player_input.choose_draw(self.game)
+
+    def test_players_must_make_every_decision(self):
+        class DrawOnlyPlayer(Player):
+            def choose_draw(self, game):
+                return '1'
+        with self.assertRaises(TypeError):
+            DrawOnlyPlayer()
+
+    @patch('builtins.print')
+    def test_go_down_ai_select(self, mock_print):
+        self.game.player_input = AIPlayer()
+        self.game.hand.add(three_of_a_kind(3))
+        self.game.hand.add(three_of_a_kind(4))
+        self.game.hand.add(three_of_a_kind(4)[:1])
+        self.game.hand.add(three_of_a_kind(5))
+        VictoryConditions.two_three_of_a_kind(self.game.hand.cards, self.game.victory_cards)
+        self.game.go_down()
+        self.assertEqual(three_of_a_kind(5), self.game.hand)
+
+    @patch('builtins.print')
+    def test_ai_player_turns(self, mock_print):
+        game = Game(seed=2, player_input=AIPlayer())
+        for turn in range(5):
+            game.players_turn()
+            game.prompt_for_discard()
+        self.assertEqual(len(game.hand) + len(game.down_cards), 11)
+
     @patch('builtins.input', side_effect=['1', '2'])
     def test_go_down_manual_select2(self, mock_input):
         self.game.hand.add(three_of_a_kind(3))
@@ -199,14 +423,11 @@ class TestGame(TestCase):
         self.game.hand.add(all_spades)
         self.game.down = True
 
-        self.game.opponents[0].down_cards.add(three_of_a_kind(3))
-        self.game.opponents[0].down_cards.add(three_of_a_kind(4))
+        put_down(self.game, self.game.opponents[0], three_of_a_kind(3), three_of_a_kind(4))
 
-        self.game.opponents[1].down_cards.add(three_of_a_kind(4))
-        self.game.opponents[1].down_cards.add(three_of_a_kind(5))
+        put_down(self.game, self.game.opponents[1], three_of_a_kind(4), three_of_a_kind(5))
 
-        self.game.opponents[2].down_cards.add(three_of_a_kind(5))
-        self.game.opponents[2].down_cards.add(three_of_a_kind(6))
+        put_down(self.game, self.game.opponents[2], three_of_a_kind(5), three_of_a_kind(6))
         self.game.prompt_to_meld()
         self.assertEqual(deque([Card(value='2', suit='Spades'),
                                 Card(value='7', suit='Spades'),
@@ -223,14 +444,11 @@ class TestGame(TestCase):
         self.game.hand.add(all_spades)
         self.game.down = True
 
-        self.game.opponents[0].down_cards.add(three_of_a_kind(3))
-        self.game.opponents[0].down_cards.add(three_of_a_kind(4))
+        put_down(self.game, self.game.opponents[0], three_of_a_kind(3), three_of_a_kind(4))
 
-        self.game.opponents[1].down_cards.add(three_of_a_kind(4))
-        self.game.opponents[1].down_cards.add(three_of_a_kind(5))
+        put_down(self.game, self.game.opponents[1], three_of_a_kind(4), three_of_a_kind(5))
 
-        self.game.opponents[2].down_cards.add(three_of_a_kind(5))
-        self.game.opponents[2].down_cards.add(three_of_a_kind(6))
+        put_down(self.game, self.game.opponents[2], three_of_a_kind(5), three_of_a_kind(6))
         self.game.prompt_to_meld()
         self.assertEqual(deque([Card(value='2', suit='Spades'),
                                 Card(value='7', suit='Spades'),
@@ -242,6 +460,123 @@ class TestGame(TestCase):
                                 Card(value='King', suit='Spades'),
                                 Card(value='Ace', suit='Spades')]), self.game.hand.cards)
 
+    def test_draw_from_empty_deck_reshuffles_discard_pile(self):
+        game = Game(headless=True, seed=1)
+        game.deck.deal(200)
+        game.discard_pile.cards = decode_cards(bytes([10, 20, 30]))
+        drawn = game.draw_from_deck()
+        self.assertIn(drawn[0], decode_cards(bytes([10, 20])))
+        self.assertEqual(1, len(game.deck))
+        self.assertEqual(decode_cards(bytes([30])), list(game.discard_pile))
+
+    def test_snapshot_and_restore(self):
+        game = Game(headless=True, seed=3)
+        game.play_headless(max_turns=5)
+        self.assertTrue(game.playing)
+        snapshot = game.snapshot()
+        game.play_headless(max_turns=1000)
+        self.assertNotEqual(snapshot, game.snapshot())
+        game.restore(snapshot)
+        self.assertEqual(snapshot, game.snapshot())
+        self.assertEqual(set(game.meld_index.groups), game.all_down_card_values)
+
+    def test_clone(self):
+        game = Game(headless=True, seed=3)
+        game.play_headless(max_turns=5)
+        self.assertTrue(game.playing)
+        snapshot = game.snapshot()
+        clone = game.clone()
+        self.assertEqual(snapshot, clone.snapshot())
+        winner = clone.play_headless(max_turns=1000)
+        self.assertEqual(snapshot, game.snapshot())
+        # the original plays out exactly as its clone did
+        self.assertEqual(game.seats.index(game.play_headless(max_turns=1000)), clone.seats.index(winner))
+        self.assertEqual(clone.snapshot(), game.snapshot())
+
+    def test_meld_index(self):
+        index = self.game.meld_index
+        put_down(self.game, self.game.opponents[1], three_of_a_kind(3), wild_three_of_a_kind(4))
+        put_down(self.game, self.game.player, three_of_a_kind(4))
+        self.assertEqual({1, 2}, set(index.groups))
+        self.assertEqual([self.game.opponents[1].down_cards, self.game.down_cards], index.targets(2))
+        self.assertEqual([], index.targets(5))
+        self.assertEqual([], index.targets(0))
+        self.game.deal(2, 0)
+        self.assertEqual([], index.targets(2))
+
+    def test_meld_index_sequences(self):
+        index = self.game.meld_index
+        down_cards = self.game.opponents[1].down_cards
+        # the 5 to 7 of spades with a wild card, which goes on the top end, and the Ace to 4 of hearts
+        put_down(self.game, self.game.opponents[1], three_of_a_kind(5),
+                 [Card('5', 'Spades'), Card('2', 'Clubs'), Card('6', 'Spades'), Card('7', 'Spades')],
+                 [Card('Ace', 'Hearts'), Card('2', 'Diamonds'), Card('3', 'Hearts'), Card('4', 'Hearts')])
+        self.assertEqual([[down_cards, 3, 4, 7], [down_cards, 2, 0, 3]], index.sequences)
+        self.assertEqual({(3, 3), (3, 8), (2, 4)}, set(index.ends))
+        self.assertEqual([down_cards], index.targets(encode_card(Card('4', 'Spades'))))
+        self.assertEqual([down_cards], index.targets(encode_card(Card('9', 'Spades'))))
+        self.assertEqual([down_cards], index.targets(encode_card(Card('5', 'Clubs'))))
+        for value, suit in (('6', 'Spades'), ('8', 'Spades'), ('4', 'Clubs'), ('Ace', 'Spades'), ('3', 'Hearts')):
+            self.assertEqual([], index.targets(encode_card(Card(value, suit))))
+        # melding moves the sequence's end, opening it to the next card
+        self.game.hand.add([Card('9', 'Spades'), Card('5', 'Hearts')])
+        self.game.meld(self.game.player, Card('9', 'Spades'), down_cards)
+        self.assertEqual([down_cards, 3, 4, 8], index.sequences[0])
+        self.assertEqual([], index.targets(encode_card(Card('9', 'Spades'))))
+        self.assertEqual([down_cards], index.targets(encode_card(Card('10', 'Spades'))))
+        # the 5 of hearts goes into the three of a kind rather than the sequence
+        self.assertEqual([down_cards, down_cards], index.targets(encode_card(Card('5', 'Hearts'))))
+        self.game.meld(self.game.player, Card('5', 'Hearts'), down_cards)
+        self.assertEqual([down_cards, 2, 0, 3], index.sequences[1])
+
+    def test_meld_one_of_two_copies(self):
+        down_cards = self.game.opponents[1].down_cards
+        # a three of a kind of 7s, and a hand with both copies of the 7 of Spades and the Queen of Diamonds
+        put_down(self.game, self.game.opponents[1], decode_cards([5, 18, 31]))
+        hand = self.game.hand
+        hand.empty()
+        hand.add(decode_cards([44, 96, 10]))
+        self.game.meld(self.game.player, hand[1], down_cards)
+        # the copy melded is the one that leaves the hand
+        self.assertEqual(bytes([44, 10]), encode_cards(hand.cards))
+        self.assertEqual(bytes([5, 18, 31, 96]), encode_cards(down_cards.cards))
+        self.assertEqual(rank_counts(encode_cards(hand.cards)), hand.counts)
+
+    def test_sequence_span(self):
+        def span(values, length):
+            return sequence_span(encode_cards([Card(value, 'Hearts') for value in values]), length)
+        self.assertEqual((4, 7), span(['5', '7'], 4))
+        self.assertEqual((10, 13), span(['Jack', 'Queen', 'King'], 4))
+        self.assertEqual((9, 13), span(['Jack', 'King'], 5))
+        self.assertEqual((10, 13), span(['Jack', 'Ace'], 4))
+        self.assertEqual((0, 3), span(['Ace', '4'], 4))
+        self.assertEqual((0, 4), span(['Ace', '3', '4'], 5))
+        self.assertEqual([4], open_ends(5, 13))
+        self.assertEqual([0, 5], open_ends(1, 4))
+        self.assertEqual([6], open_ends(2, 5))
+        self.assertEqual([], open_ends(0, 13))
+
+    def test_auto_meld_into_sequences(self):
+        opponent = self.game.opponents[0]
+        opponent.hand.empty()
+        opponent.hand.add([Card('10', 'Spades'), Card('9', 'Spades'), Card('9', 'Hearts'), Card('4', 'Spades')])
+        self.game.round = 3
+        put_down(self.game, self.game.opponents[1], [Card(value, 'Spades') for value in ('5', '6', '7', '8')],
+                 [Card(value, 'Hearts') for value in ('Jack', 'Queen', 'King', 'Ace')])
+        self.game.auto_meld(opponent)
+        # the 10 of spades only fits once the 9 is melded, and the 9 of hearts never does
+        self.assertEqual(Stack(cards=deque([Card('9', 'Hearts')])), opponent.hand)
+        self.assertEqual([3, 3, 9], self.game.meld_index.sequences[0][1:])
+
+    @patch('builtins.input', side_effect=['2', '1'])
+    def test_prompt_to_meld_manual_meld_into_own_down_cards(self, mock_input):
+        self.game.hand.add(Card('4', 'Spades'))
+        self.game.down = True
+        put_down(self.game, self.game.player, three_of_a_kind(4))
+        self.game.prompt_to_meld()
+        self.assertEqual(Stack(), self.game.hand)
+        self.assertEqual(4, len(self.game.down_cards))
+
     def test_get_discard_choices(self):
         self.game.hand.add(all_spades)
         self.game.down = True
@@ -249,14 +584,176 @@ class TestGame(TestCase):
             opponent.hand.empty()
 
         self.game.opponents[0].hand.add(all_spades)
-        self.game.opponents[0].down_cards.add(three_of_a_kind(3))
-        self.game.opponents[0].down_cards.add(three_of_a_kind(4))
+        put_down(self.game, self.game.opponents[0], three_of_a_kind(3), three_of_a_kind(4))
 
-        self.game.opponents[1].down_cards.add(three_of_a_kind(4))
-        self.game.opponents[1].down_cards.add(three_of_a_kind(5))
+        put_down(self.game, self.game.opponents[1], three_of_a_kind(4), three_of_a_kind(5))
 
-        self.game.opponents[2].down_cards.add(three_of_a_kind(5))
-        self.game.opponents[2].down_cards.add(three_of_a_kind(6))
+        put_down(self.game, self.game.opponents[2], three_of_a_kind(5), three_of_a_kind(6))
 
         # 7 of Spades through Ace of Spades (indices)
         self.assertEqual([5, 6, 7, 8, 9, 10, 11, 12], self.game.get_discard_choices(self.game.opponents[0]))
+
+    @patch('builtins.print')
+    @patch('builtins.input', side_effect=AssertionError("headless games must not prompt"))
+    def test_play_headless(self, mock_input, mock_print):
+        game = Game(headless=True)
+        winner = game.play_headless()
+        self.assertFalse(game.playing)
+        self.assertIn(winner, [game.player] + game.opponents)
+        self.assertEqual(Stack(), winner.hand)
+        mock_input.assert_not_called()
+        mock_print.assert_not_called()
+
+    def test_auto_meld(self):
+        opponent = self.game.opponents[0]
+        opponent.hand.empty()
+        opponent.hand.add([Card('2', 'Spades'), Card('3', 'Spades'), Card('9', 'Spades')])
+        put_down(self.game, self.game.opponents[1], three_of_a_kind(3))
+        self.game.auto_meld(opponent)
+        self.assertEqual(Stack(cards=deque([Card('2', 'Spades'), Card('9', 'Spades')])), opponent.hand)
+        self.assertEqual(4, len(self.game.opponents[1].down_cards))
+
+
+class TestMayI(TestCase):
+    def setUp(self) -> None:
+        self.game = Game(headless=True, seed=0)
+        self.game.round = 4
+        self.game.discard_pile.cards = [Card('9', 'Hearts')]
+        for seat in self.game.seats:
+            seat.hand.empty()
+            seat.hand.add([Card('5', 'Clubs'), Card('King', 'Spades')])
+
+    def test_not_in_round_1(self):
+        self.game.round = 1
+        self.game.seats[2].hand.add([Card('9', 'Clubs'), Card('9', 'Spades')])
+        self.assertIsNone(self.game.offer_discard(self.game.seats[1]))
+
+    def test_claim(self):
+        seat = self.game.seats[3]
+        seat.hand.add([Card('9', 'Clubs'), Card('9', 'Spades')])
+        deck_size = len(self.game.deck)
+        events = []
+        self.game.listeners.append(events.append)
+        self.assertIs(seat, self.game.offer_discard(self.game.seats[1]))
+        self.assertEqual(6, len(seat.hand))
+        self.assertIn(Card('9', 'Hearts'), seat.hand.cards)
+        self.assertEqual(0, len(self.game.discard_pile))
+        self.assertEqual(deck_size - 1, len(self.game.deck))
+        self.assertEqual(1, seat.claims)
+        self.assertEqual([(Events.MAY_I, 3, 0)], [event[:2] + event[3:] for event in events[:1]])
+        self.assertEqual((Events.MAY_I, 3, 1), events[1][:2] + events[1][3:])
+
+    def test_priority(self):
+        for seat in self.game.seats[2:4]:
+            seat.hand.add([Card('9', 'Clubs'), Card('9', 'Spades')])
+        self.assertIs(self.game.seats[2], self.game.offer_discard(self.game.seats[1]))
+        # after the passing seat, in turn order
+        self.game.discard_pile.cards = [Card('9', 'Hearts')]
+        self.assertIs(self.game.seats[3], self.game.offer_discard(self.game.seats[2]))
+
+    def test_who_cannot_claim(self):
+        for seat in self.game.seats:
+            seat.hand.add([Card('9', 'Clubs'), Card('9', 'Spades')])
+        # seat 0 discarded, seat 1 passed, seat 2 is down and seat 3 has used its claims
+        self.game.seats[2].down = True
+        self.game.seats[3].claims = self.game.may_i_limit
+        self.assertIs(self.game.seats[4], self.game.offer_discard(self.game.seats[1]))
+        self.game.discard_pile.cards = [Card('9', 'Hearts')]
+        self.game.seats[4].claims = self.game.may_i_limit
+        self.assertIsNone(self.game.offer_discard(self.game.seats[1]))
+
+    @patch('builtins.print')
+    def test_player_claim(self, mock_print):
+        self.game.headless = False
+        self.game.player_input = ScriptedPlayer(['2', '1'])
+        self.assertIsNone(self.game.offer_discard(self.game.seats[3]))
+        self.game.discard_pile.cards = [Card('9', 'Hearts')]
+        self.assertIs(self.game.player, self.game.offer_discard(self.game.seats[3]))
+        self.assertIn(Card('9', 'Hearts'), self.game.hand.cards)
+
+    def test_claims_are_kept_in_snapshots(self):
+        self.game.seats[3].claims = 2
+        snapshot = self.game.snapshot()
+        self.game.seats[3].claims = 0
+        self.game.restore(snapshot)
+        self.assertEqual(2, self.game.seats[3].claims)
+
+    def test_plays_the_other_rounds(self):
+        for round_number in range(2, 8):
+            game = Game(headless=True, seed=round_number)
+            game.round = round_number
+            game.play_headless(max_turns=200)
+            self.assertTrue(all(seat.claims <= game.may_i_limit for seat in game.seats))
+
+
+class TestMatch(TestCase):
+    def setUp(self) -> None:
+        self.game = Game(headless=True, seed=0)
+
+    def test_deal(self):
+        self.game.play_headless(max_turns=30)
+        events = []
+        self.game.listeners.append(events.append)
+        self.game.deal(3, 2)
+        self.assertEqual((3, 2, 0, True, None), (self.game.round, self.game.dealer, self.game.turns,
+                                                 self.game.playing, self.game.winner))
+        self.assertEqual([11] * 5, [len(seat.hand) for seat in self.game.seats])
+        self.assertFalse(any(seat.down or seat.down_cards or seat.claims for seat in self.game.seats))
+        self.assertEqual({}, self.game.meld_index.groups)
+        self.assertEqual(1, len(self.game.discard_pile))
+        self.assertEqual(104 - 56, len(self.game.deck))
+        self.assertEqual((Events.GAME, Events.TABLE, 0, 3), events[0])
+        self.assertEqual([Events.DEAL] * 56, [event[0] for event in events[1:]])
+
+    def test_play_match(self):
+        ledger = self.game.play_match(max_turns=300)
+        self.assertEqual(7, len(ledger))
+        self.assertEqual([sum(points) for points in zip(*ledger)], self.game.scores)
+        self.assertEqual(7, self.game.round)
+        # the deal passes to the left each round
+        self.assertEqual((4 + 6) % 5, self.game.dealer)
+        for round_points in ledger:
+            self.assertLessEqual(round_points.count(0), 1)
+
+    @patch('builtins.print')
+    def test_start(self, mock_print):
+        game = Game(seed=0, player_input=AIPlayer())
+        game.rounds = {round_number: game.rounds[round_number] for round_number in (1, 2)}
+        game.start()
+        self.assertEqual(2, game.round)
+        self.assertEqual(0, game.dealer)
+        self.assertFalse(game.playing)
+        self.assertEqual(game.winner.seat_index, game.seats.index(game.winner))
+        self.assertGreater(sum(game.scores), 0)
+
+
+class TestStylePolicy(TestCase):
+    def test_default_style_plays_like_the_heuristic_policy(self):
+        for seed in range(14):
+            game = Game(headless=True, seed=seed)
+            styled = Game(headless=True, seed=seed)
+            for seat in styled.seats:
+                seat.policy = StylePolicy()
+            # every round, sequences and all
+            round_number, dealer = 1 + seed % 7, seed % 5
+            for each in (game, styled):
+                each.deal(round_number, dealer)
+                each.play_headless(seat_index=(dealer + 1) % 5)
+            self.assertEqual(game.snapshot(), styled.snapshot())
+
+    def test_style(self):
+        game = Game(headless=True, seed=0)
+        seat = game.opponents[0]
+        # a hand of the 3, 5, 4 and 4 of a suit, with a 4 of another suit on the discard pile
+        seat.hand.cards = decode_cards([1, 3, 2, 54])
+        game.discard_pile.cards = decode_cards([41])
+        self.assertTrue(StylePolicy(Style(take_count=2)).draw_from_discard_pile(game, seat))
+        self.assertFalse(StylePolicy(Style(take_count=3)).draw_from_discard_pile(game, seat))
+        self.assertEqual(1, StylePolicy().discard_index(game, seat))
+        self.assertEqual(0, StylePolicy(Style(discard_highest=0)).discard_index(game, seat))
+        game.round = 4
+        self.assertTrue(StylePolicy().may_i(game, seat))
+        self.assertFalse(StylePolicy(Style(claim_count=3)).may_i(game, seat))
+
+    def test_opponent_plays_a_named_style(self):
+        self.assertEqual(Style(), Opponent("Blinky", BColors.RED, style="default").policy.style)
@@ -0,0 +1,41 @@
+from io import BytesIO
+from unittest import TestCase
+
+from src.main import Game
+from src.matches import MatchWriter, read_matches, run_matches, aggregate, match_seed, HEADER, RECORD, NO_WINNER
+
+
+class TestMatches(TestCase):
+    def setUp(self) -> None:
+        self.log = BytesIO()
+        writer = MatchWriter(self.log, buffer_size=RECORD.size)
+        for record in run_matches(3, seed=1, processes=1, max_turns=200):
+            writer.write(record)
+        writer.flush()
+        self.log.seek(0)
+
+    def test_records(self):
+        self.assertEqual(HEADER.size + 3 * RECORD.size, len(self.log.getvalue()))
+        records = list(read_matches(self.log, chunk_size=1))
+        self.assertEqual([match_seed(1, match_number) for match_number in range(3)],
+                         [record.seed for record in records])
+        game = Game(headless=True, seed=records[0].seed)
+        ledger = game.play_match(max_turns=200)
+        self.assertEqual(tuple(map(tuple, ledger)), records[0].points)
+        self.assertEqual(tuple(NO_WINNER if winner is None else winner for winner in game.round_winners),
+                         records[0].winners)
+
+    def test_rounds_at_the_turn_cap_have_no_winner(self):
+        game = Game(headless=True, seed=1)
+        game.play_match(max_turns=5)
+        self.assertEqual([None] * 7, game.round_winners)
+
+    def test_aggregate(self):
+        summary = aggregate(read_matches(self.log))
+        self.assertEqual(3, summary["matches"])
+        self.assertGreaterEqual(sum(summary["match_wins"]), 3)
+        self.assertEqual(21, sum(summary["round_wins"]) + summary["unfinished_rounds"])
+
+    def test_rejects_other_files(self):
+        with self.assertRaises(ValueError):
+            next(read_matches(BytesIO(b"MAYE\1\0")))
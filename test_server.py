@@ -0,0 +1,86 @@
+import asyncio
+from unittest import TestCase
+
+from src.main import CARDS, decode_cards
+from src.server import Table, load_test, play_ai_turns, DRAW, GO_DOWN, DISCARD, OVER
+
+
+class TestTable(TestCase):
+    def setUp(self) -> None:
+        self.table = Table(1, seed=4)
+
+    def test_turn(self):
+        state = self.table.state()
+        self.assertEqual(DRAW, state["prompt"])
+        self.assertEqual(11, len(state["hand"]))
+        with self.assertRaises(ValueError):
+            self.table.handle({"op": DISCARD, "card": 0})
+        self.assertFalse(self.table.handle({"op": DRAW, "from_discard_pile": False}))
+        if self.table.prompt == GO_DOWN:
+            self.assertFalse(self.table.handle({"op": GO_DOWN, "go_down": False}))
+        self.assertEqual(DISCARD, self.table.prompt)
+        with self.assertRaises(ValueError):
+            self.table.handle({"op": DISCARD, "card": 12})
+        self.assertTrue(self.table.handle({"op": DISCARD, "card": 0}))
+        self.table.finish_ai_turns(*play_ai_turns(self.table.ai_turns()))
+        state = self.table.state()
+        self.assertEqual(DRAW, state["prompt"])
+        self.assertEqual(5, state["turns"])
+        self.assertEqual(["draw", "discard"], [event[0] for event in state["events"][:2]])
+        # the seat sees the card it drew, but not the cards the AI seats drew from the deck
+        self.assertIsNotNone(state["events"][0][2])
+        self.assertTrue(all(event[2] is None for event in state["events"][2:]
+                            if event[0] == "draw" and not event[3]))
+
+    def test_meld_must_match_down_cards(self):
+        self.table.handle({"op": DRAW})
+        self.table.game.player.down = True
+        with self.assertRaises(ValueError):
+            self.table.handle({"op": "meld", "card": 0, "seat": 1})
+
+    def test_meld_needs_a_seat_at_the_table(self):
+        self.table.handle({"op": DRAW})
+        self.table.game.player.down = True
+        self.table.prompt = DISCARD
+        for seat in (-1, 5):
+            with self.assertRaisesRegex(ValueError, "no seat"):
+                self.table.handle({"op": "meld", "card": 0, "seat": seat})
+
+    def test_meld_one_of_two_identical_cards(self):
+        game = self.table.game
+        target = game.seats[2]
+        # a three of a kind of 7s to meld into, and a hand with both copies of the 7 of Spades
+        target.down_cards.add(decode_cards([5, 18, 31]))
+        game.register_down_cards(target, [list(target.down_cards.cards)])
+        game.player.hand.empty()
+        game.player.hand.add(decode_cards([44, 96, 10]))
+        game.player.down = True
+        self.table.prompt = DISCARD
+        self.assertFalse(self.table.handle({"op": "meld", "card": 1, "seat": 2}))
+        state = self.table.state()
+        self.assertEqual([44, 10], state["hand"])
+        self.assertEqual([5, 18, 31, 96], state["down_cards"][2])
+
+    def test_going_down_with_every_card_wins(self):
+        game = self.table.game
+        game.deal(7, 4)
+        self.table.handle({"op": DRAW})
+        # three sequences of four, the whole hand
+        game.player.hand.empty()
+        game.player.hand.add([CARDS[code] for code in (1, 2, 3, 4, 14, 15, 16, 17, 27, 28, 29, 30)])
+        self.table.prompt = GO_DOWN
+        self.assertFalse(self.table.handle({"op": GO_DOWN, "go_down": True}))
+        self.assertEqual(OVER, self.table.prompt)
+        self.assertIs(game.player, game.winner)
+        self.assertFalse(game.playing)
+
+
+class TestServer(TestCase):
+    def test_load_test(self):
+        for processes in (0, 1):
+            results = asyncio.run(load_test(4, processes=processes, seed=processes))
+            self.assertEqual(4, len(results))
+            for state, latencies in results:
+                self.assertEqual(OVER, state["prompt"])
+                self.assertIsNotNone(state["winner"])
+                self.assertTrue(latencies)
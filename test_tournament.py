@@ -0,0 +1,15 @@
+from unittest import TestCase
+
+from src.tournament import play_game, replay_game, run_tournament
+
+
+class TestTournament(TestCase):
+    def test_games_are_reproducible(self):
+        self.assertEqual(play_game((7, 3, 1000)), play_game((7, 3, 1000)))
+        self.assertEqual(play_game((7, 3, 1000)).turns, replay_game(7, 3).turns)
+
+    def test_results_do_not_depend_on_process_count(self):
+        serial = sorted(run_tournament(20, seed=1, processes=1))
+        parallel = sorted(run_tournament(20, seed=1, processes=2, chunksize=3))
+        self.assertEqual(serial, parallel)
+        self.assertEqual(list(range(20)), [record.game_number for record in serial])
@@ -0,0 +1,85 @@
+from unittest import TestCase
+
+from src.main import Game, Events, encode_cards
+from src.tracker import UnseenTracker, TrackingPolicy
+
+
+def unseen_cards(game, seat_index):
+    """The copies of each card in the deck or the other seats' hands, counted directly."""
+    counts = [0] * 52
+    stacks = [game.deck] + [seat.hand for seat in game.seats if seat.seat_index != seat_index]
+    for stack in stacks:
+        for code in encode_cards(stack.cards):
+            counts[code % 52] += 1
+    return counts
+
+
+class TestUnseenTracker(TestCase):
+    def test_starts_with_what_the_seat_can_see(self):
+        game = Game(headless=True, seed=0)
+        tracker = UnseenTracker.from_game(game, game.opponents[1])
+        self.assertEqual(unseen_cards(game, 2), tracker.unseen)
+        self.assertEqual(104 - len(game.opponents[1].hand) - len(game.discard_pile), tracker.total)
+        self.assertIn(tracker, game.listeners)
+
+    def follow(self, game):
+        trackers = [UnseenTracker.from_game(game, seat) for seat in game.seats]
+        while game.playing and game.turns < 1000:
+            seat_index = game.turns % len(game.seats)
+            seat = game.seats[seat_index]
+            game.turns += 1
+            game.opponents_turn(seat_index, seat)
+            game.check_for_winner(seat)
+            for tracker in trackers:
+                # the unseen cards, less those the seat knows another seat took from the discard pile
+                unseen = unseen_cards(game, tracker.seat_index)
+                for known in tracker.known:
+                    unseen = [count - known_count for count, known_count in zip(unseen, known)]
+                self.assertEqual(unseen, tracker.unseen)
+                self.assertEqual(sum(unseen), tracker.total)
+                self.assertEqual([sum(unseen[rank::13]) for rank in range(13)], tracker.rank_unseen)
+                self.assertEqual([sum(unseen[suit * 13:suit * 13 + 13]) for suit in range(4)], tracker.suit_unseen)
+
+    def test_follows_the_game(self):
+        game = Game(headless=True, seed=0)
+        # leave the deck nearly empty, so it's reshuffled during the game
+        game.discard_pile.add(game.deck.deal(len(game.deck) - 2))
+        reshuffles = []
+        game.listeners.append(lambda event: event[0] == Events.RESHUFFLE and reshuffles.append(event))
+        self.follow(game)
+        self.assertTrue(reshuffles)
+
+    def test_follows_may_i_claims(self):
+        game = Game(headless=True, seed=1)
+        game.round = 6
+        self.follow(game)
+        self.assertTrue(any(seat.claims for seat in game.seats))
+
+    def test_starts_over_on_a_new_deal(self):
+        game = Game(headless=True, seed=0)
+        tracker = UnseenTracker.from_game(game, game.opponents[1])
+        game.play_headless(max_turns=20)
+        game.deal(2, 0)
+        self.assertEqual(unseen_cards(game, 2), tracker.unseen)
+        self.assertEqual([[0] * 52] * 5, tracker.known)
+
+    def test_probability(self):
+        tracker = UnseenTracker(0)
+        self.assertEqual(0, tracker.probability(0))
+        self.assertAlmostEqual(8 / 104, tracker.probability(tracker.rank_unseen[5]))
+        self.assertAlmostEqual(1 - (96 / 104) * (95 / 103), tracker.probability(8, draws=2))
+        self.assertEqual(1, tracker.probability(8, draws=200))
+        self.assertEqual(16, tracker.set_outs(5))
+        self.assertEqual(2, tracker.outs([5, 57]))
+
+
+class TestTrackingPolicy(TestCase):
+    def test_plays_games(self):
+        wins = 0
+        for seed in range(20):
+            game = Game(headless=True, seed=seed)
+            game.player.policy = TrackingPolicy()
+            game.play_headless()
+            self.assertFalse(game.playing)
+            wins += game.winner is game.player
+        self.assertGreater(wins, 0)
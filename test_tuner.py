@@ -0,0 +1,52 @@
+import os
+import tempfile
+from random import Random
+from unittest import TestCase
+
+from src.main import Style, STYLES
+from src.tuner import PARAMETERS, STYLE_COUNT, evaluate, mutate, next_generation, save_styles, load_styles, tune, \
+    Evaluation
+
+
+class TestTuner(TestCase):
+    def test_evaluate_with_common_random_numbers(self):
+        styles = [Style(), Style(take_count=2)]
+        seeds = list(range(6))
+        evaluations = evaluate(styles, seeds, chunk_games=4)
+        self.assertEqual(set(styles), {evaluation.style for evaluation in evaluations})
+        self.assertLessEqual(evaluations[0].points, evaluations[1].points)
+        # the same deals give the same results
+        self.assertEqual(evaluations, evaluate(styles, seeds))
+
+    def test_mutate(self):
+        rng = Random(0)
+        for _ in range(50):
+            style = mutate(Style(), rng)
+            self.assertNotEqual(Style(), style)
+            self.assertTrue(all(value in values for value, values in zip(style, PARAMETERS)))
+
+    def test_next_generation(self):
+        evaluations = [Evaluation(Style(take_count=count), 10, count, 0) for count in range(4)]
+        styles = next_generation(evaluations, 8, 2, Random(0))
+        self.assertEqual([Style(take_count=0), Style(take_count=1)], styles[:2])
+        self.assertEqual(8, len(set(styles)))
+
+    def test_next_generation_of_every_style(self):
+        evaluations = [Evaluation(Style(take_count=count), 10, count, 0) for count in range(4)]
+        styles = next_generation(evaluations, STYLE_COUNT, 2, Random(0))
+        self.assertEqual(STYLE_COUNT, len(set(styles)))
+
+    def test_population_larger_than_the_styles(self):
+        with self.assertRaises(ValueError):
+            tune(generations=1, population=STYLE_COUNT + 1, processes=1)
+
+    def test_save_and_load_styles(self):
+        path = os.path.join(tempfile.mkdtemp(), "styles.json")
+        save_styles({"cautious": Style(take_count=2)}, path)
+        save_styles({"greedy": Style(take_count=0)}, path)
+        try:
+            self.assertEqual({"cautious": Style(take_count=2), "greedy": Style(take_count=0)}, load_styles(path))
+            self.assertEqual(Style(take_count=0), STYLES["greedy"])
+        finally:
+            STYLES.pop("cautious", None)
+            STYLES.pop("greedy", None)
@@ -0,0 +1,50 @@
+import random
+from unittest import TestCase
+
+import numpy as np
+
+from src.main import VictoryConditions, WILD_RANK, choose_three_of_a_kinds, rank_counts
+from src.vectorized import evaluate_round, rank_count_matrix, victory_rank_bits
+
+
+class TestVectorized(TestCase):
+    def setUp(self) -> None:
+        rng = random.Random(0)
+        self.hands = [bytes(rng.sample(range(104), rng.randint(0, 16))) for _ in range(5000)]
+
+    def test_rank_count_matrix(self):
+        expected = [rank_counts(hand) for hand in self.hands]
+        self.assertEqual(expected, rank_count_matrix(self.hands).tolist())
+
+    def test_two_three_of_a_kind_matches_scalar(self):
+        can_go_down, victory_ranks = evaluate_round(1, self.hands)
+        expected = [VictoryConditions.two_three_of_a_kind_ranks(rank_counts(hand)) for hand in self.hands]
+        self.assertEqual([result[0] for result in expected], can_go_down.tolist())
+        self.assertEqual([result[1] for result in expected], victory_rank_bits(victory_ranks).tolist())
+
+    def test_two_three_of_a_kind_from_count_matrix(self):
+        counts = np.array([[0, 3, 3, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+                           [1, 3, 1, 2, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+                           [1, 2, 2, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]])
+        can_go_down, victory_ranks = evaluate_round(1, counts)
+        self.assertEqual([True, True, False], can_go_down.tolist())
+        self.assertEqual([0b110, 0b1011, 0], victory_rank_bits(victory_ranks).tolist())
+
+    def test_three_three_of_a_kind_matches_scalar(self):
+        can_go_down, victory_ranks = evaluate_round(4, self.hands)
+        expected = []
+        for hand in self.hands:
+            counts = rank_counts(hand)
+            chosen = choose_three_of_a_kinds(counts, counts[WILD_RANK], 3)
+            if chosen is None:
+                expected.append((False, 0))
+            else:
+                wild = any(wilds for rank, wilds in chosen)
+                expected.append((True, sum(1 << rank for rank, wilds in chosen) | wild << WILD_RANK))
+        self.assertEqual([result[0] for result in expected], can_go_down.tolist())
+        self.assertEqual([result[1] for result in expected], victory_rank_bits(victory_ranks).tolist())
+        self.assertGreater(sum(can_go_down), 0)
+
+    def test_sequence_rounds_are_not_batched(self):
+        with self.assertRaises(ValueError):
+            evaluate_round(3, self.hands)
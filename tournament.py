@@ -0,0 +1,72 @@
+"""Runs large batches of headless May I games across a process pool.
+
+Every game is seeded from the tournament seed and its game number alone, so results do not depend on how the
+games were split across workers, and any single game can be replayed exactly with ``replay_game``.
+"""
+import argparse
+import time
+from collections import Counter, namedtuple
+from multiprocessing import Pool
+
+from src.main import Game, get_points
+
+SEAT_NAMES = ["You", "Blinky", "Pinky", "Inky", "Clyde"]
+
+# winner is the winning seat index, or -1 if the game hit the turn limit
+GameRecord = namedtuple("GameRecord", ["game_number", "winner", "turns", "points"])
+
+
+def game_seed(tournament_seed, game_number):
+    return (tournament_seed << 32) | game_number
+
+
+def replay_game(tournament_seed, game_number, max_turns=1000):
+    game = Game(headless=True, seed=game_seed(tournament_seed, game_number))
+    game.play_headless(max_turns=max_turns)
+    return game
+
+
+def play_game(args):
+    tournament_seed, game_number, max_turns = args
+    game = replay_game(tournament_seed, game_number, max_turns)
+    seats = [game.player] + game.opponents
+    winner = seats.index(game.winner) if game.winner else -1
+    return GameRecord(game_number, winner, game.turns, tuple(get_points(seat.hand) for seat in seats))
+
+
+def run_tournament(games, seed=0, processes=None, max_turns=1000, chunksize=256):
+    """Yields a GameRecord per game, in completion order, as the worker processes finish them."""
+    tasks = ((seed, game_number, max_turns) for game_number in range(games))
+    if processes == 1:
+        yield from map(play_game, tasks)
+        return
+    with Pool(processes) as pool:
+        yield from pool.imap_unordered(play_game, tasks, chunksize=chunksize)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a tournament of headless May I games.")
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None, help="defaults to the number of cores")
+    parser.add_argument("--max-turns", type=int, default=1000)
+    args = parser.parse_args()
+
+    wins = Counter()
+    total_turns = 0
+    start = time.perf_counter()
+    for record in run_tournament(args.games, args.seed, args.processes, args.max_turns):
+        wins[record.winner] += 1
+        total_turns += record.turns
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.games} games in {elapsed:.2f}s ({args.games / elapsed:.0f} games/s), "
+          f"{total_turns / args.games:.1f} turns per game on average\n")
+    for seat_index, name in enumerate(SEAT_NAMES):
+        print(f"{name}: {wins[seat_index]} wins")
+    if wins[-1]:
+        print(f"Unfinished: {wins[-1]}")
+
+
+if __name__ == '__main__':
+    main()
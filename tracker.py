@@ -0,0 +1,152 @@
+"""Tracks the cards a seat hasn't seen, to give the AI the odds of drawing the cards it needs.
+
+A seat has seen its own hand, every card discarded, and everyone's down cards. Everything else is in the deck or
+another seat's hand, where the seat can't tell which. The tracker is a game listener that keeps the number of unseen
+copies (0-2) of each of the 52 cards, and the unseen total per rank and per suit, updating them in constant time per
+event. Cards are tracked by rank and suit alone, so card codes are taken modulo 52.
+
+A seat also knows which cards the others took from the discard pile, so those stay seen when they're played again.
+Trackers start over when a new round is dealt.
+"""
+from math import comb
+
+from src.main import Events, HeuristicPolicy, WILD_RANK, CARD_RANKS, CARD_SUITS, encode_card, encode_cards
+
+
+class UnseenTracker:
+    def __init__(self, seat_index, seat_count=5):
+        self.seat_index = seat_index
+        self.seat_count = seat_count
+        self.reset()
+
+    def reset(self):
+        """Forgets every card seen, for a new deal."""
+        self.unseen = [2] * 52
+        self.rank_unseen = [8] * 13
+        self.suit_unseen = [26] * 4
+        self.total = 104
+        # known[seat][card] counts the cards each other seat took from the discard pile, and hasn't played since
+        self.known = [[0] * 52 for _ in range(self.seat_count)]
+        # the discard pile, since a reshuffle returns all but its top card to the unseen cards
+        self.discard_pile = []
+
+    @classmethod
+    def from_game(cls, game, seat, listen=True):
+        """Returns a tracker for the seat that has seen what's on the table, listening to the game's events unless
+        listen is false."""
+        tracker = cls(seat.seat_index, len(game.seats))
+        for code in encode_cards(seat.hand.cards):
+            tracker.see(code)
+        for code in encode_cards(game.discard_pile.cards):
+            tracker.see(code)
+            tracker.discard_pile.append(code % 52)
+        for other in game.seats:
+            for code in encode_cards(other.down_cards.cards):
+                tracker.see(code)
+        if listen:
+            game.listeners.append(tracker)
+        return tracker
+
+    def see(self, code):
+        card = code % 52
+        self.unseen[card] -= 1
+        self.rank_unseen[CARD_RANKS[card]] -= 1
+        self.suit_unseen[CARD_SUITS[card]] -= 1
+        self.total -= 1
+
+    def unsee(self, card):
+        self.unseen[card] += 1
+        self.rank_unseen[CARD_RANKS[card]] += 1
+        self.suit_unseen[CARD_SUITS[card]] += 1
+        self.total += 1
+
+    def reveal(self, seat_index, code):
+        """Sees a card another seat played from its hand, unless it was already known to be there."""
+        known = self.known[seat_index]
+        if known[code % 52]:
+            known[code % 52] -= 1
+        else:
+            self.see(code)
+
+    def __call__(self, event):
+        kind, seat_index, code, argument = event
+        own = seat_index == self.seat_index
+        if kind == Events.DRAW or kind == Events.MAY_I:
+            # draws from the discard pile, and claims of it, are seen; draws from the deck and penalty cards aren't
+            if argument == (kind == Events.DRAW):
+                card = self.discard_pile.pop()
+                if not own:
+                    self.known[seat_index][card] += 1
+            elif own:
+                self.see(code)
+        elif kind == Events.DISCARD:
+            if not own:
+                self.reveal(seat_index, code)
+            self.discard_pile.append(code % 52)
+        elif kind in (Events.MELD, Events.GO_DOWN):
+            if not own:
+                self.reveal(seat_index, code)
+        elif kind == Events.DEAL:
+            if own:
+                self.see(code)
+            elif seat_index == Events.TABLE:
+                self.see(code)
+                self.discard_pile.append(code % 52)
+        elif kind == Events.GAME:
+            # a new deal, whose hands and discard pile follow as DEAL events
+            self.reset()
+        elif kind == Events.RESHUFFLE:
+            for card in self.discard_pile[:-1]:
+                self.unsee(card)
+            del self.discard_pile[:-1]
+
+    def outs(self, cards):
+        """The number of unseen copies of the cards, given as codes."""
+        return sum(self.unseen[code % 52] for code in set(code % 52 for code in cards))
+
+    def set_outs(self, rank):
+        """The unseen cards that would add to a set of the rank: that rank in any suit, or a wild card."""
+        return self.rank_unseen[rank] + self.rank_unseen[WILD_RANK]
+
+    def probability(self, outs, draws=1):
+        """The chance of drawing at least one of outs unseen cards in the next draws, if each draw is equally likely
+        to be any unseen card."""
+        if outs <= 0 or self.total <= 0:
+            return 0.0
+        draws = min(draws, self.total)
+        return 1 - comb(self.total - outs, draws) / comb(self.total, draws)
+
+
+class TrackingPolicy(HeuristicPolicy):
+    """The heuristic policy, with its draw and discard decisions made from what the seat hasn't seen.
+
+    It only takes the discard when it's wild or makes a three of a kind, and throws away cards whose rank can't make
+    a set any more first, then the rank it holds fewest of, lowest first.
+    """
+
+    def __init__(self):
+        self.game = None
+        self.tracker = None
+
+    def tracker_for(self, game, opponent):
+        """The seat's tracker for the game, started the first time the policy is asked about it."""
+        if self.game is not game:
+            self.game = game
+            self.tracker = UnseenTracker.from_game(game, opponent)
+        return self.tracker
+
+    def draw_from_discard_pile(self, game, opponent):
+        self.tracker_for(game, opponent)
+        rank = CARD_RANKS[encode_card(game.discard_pile[len(game.discard_pile) - 1])]
+        return rank == WILD_RANK or opponent.hand.counts[rank] >= 2
+
+    def discard_index(self, game, opponent):
+        tracker = self.tracker_for(game, opponent)
+        game.update_all_down_card_values()
+        counts = opponent.hand.counts
+        choices = [(tracker.set_outs(rank) > 0, counts[rank], card_index)
+                   for card_index, rank in enumerate(CARD_RANKS[code] for code in encode_cards(opponent.hand.cards))
+                   if rank != WILD_RANK and rank not in game.all_down_card_values and counts[rank] < 3]
+        if not choices:
+            return super().discard_index(game, opponent)
+        return min(choices)[2]
@@ -0,0 +1,184 @@
+"""Tunes the AI's playing style (see main.Style) with a genetic search over headless self-play.
+
+Each candidate style plays the player's seat against four default opponents. A generation's candidates all play the
+same seeded deals (common random numbers), so the differences between their results come from the styles rather
+than the cards. Each generation draws new deals, so the survivors are evaluated afresh rather than keeping a lucky
+score. Deals cover all seven rounds, and a candidate is scored by the points it's left holding at the end of each
+round, lowest best, as in a match.
+
+Games are spread over a process pool. The best styles can be written to a JSON file of named styles, which
+load_styles adds to main.STYLES for Opponent(style=...).
+"""
+import argparse
+import json
+import math
+import random
+import time
+from collections import namedtuple
+from itertools import product
+from multiprocessing import Pool
+
+from src.main import Game, Style, StylePolicy, STYLES
+
+# the values each parameter can take
+PARAMETERS = Style(take_count=range(4), take_wild=range(2), discard_highest=range(2), keep_down_ranks=range(2),
+                   claim_wild=range(2), claim_count=range(1, 5))
+# the number of distinct styles
+STYLE_COUNT = math.prod(len(values) for values in PARAMETERS)
+ROUNDS = 7
+
+# points is the candidate's total over the games, wins the rounds it went out in
+Evaluation = namedtuple("Evaluation", ["style", "games", "points", "wins"])
+
+
+def evaluation_seed(seed, generation, game_number):
+    return (seed << 40) | (generation << 24) | game_number
+
+
+def play_games(args):
+    """Plays the style in the player's seat on the given deals, returning its total points and wins."""
+    style, seeds, max_turns = args
+    points = wins = 0
+    for seed in seeds:
+        game = Game(headless=True, seed=seed)
+        game.player.policy = StylePolicy(style)
+        dealer = seed % len(game.seats)
+        game.deal(1 + seed % ROUNDS, dealer)
+        game.play_headless(max_turns, seat_index=(dealer + 1) % len(game.seats))
+        points += game.player.hand.points
+        wins += game.winner is game.player
+    return style, points, wins
+
+
+def evaluate(styles, seeds, pool=None, max_turns=300, chunk_games=25):
+    """Plays every style on the same seeded deals, returning an Evaluation per style, best (fewest points) first."""
+    tasks = [(style, seeds[start:start + chunk_games], max_turns)
+             for style in styles for start in range(0, len(seeds), chunk_games)]
+    totals = {style: [0, 0] for style in styles}
+    for style, points, wins in (pool.imap_unordered(play_games, tasks) if pool else map(play_games, tasks)):
+        totals[style][0] += points
+        totals[style][1] += wins
+    return sorted((Evaluation(style, len(seeds), points, wins) for style, (points, wins) in totals.items()),
+                  key=lambda evaluation: (evaluation.points, -evaluation.wins))
+
+
+def random_style(rng):
+    return Style(*(rng.choice(values) for values in PARAMETERS))
+
+
+def mutate(style, rng, rate=0.3):
+    """Changes each parameter with probability rate, and at least one, to another of its values."""
+    changed = [rng.random() < rate for _ in style]
+    changed[rng.randrange(len(style))] = True
+    return Style(*(rng.choice([other for other in values if other != value]) if change else value
+                   for value, values, change in zip(style, PARAMETERS, changed)))
+
+
+def crossover(first, second, rng):
+    return Style(*(rng.choice(pair) for pair in zip(first, second)))
+
+
+def next_generation(evaluations, population, elite, rng, attempts=100):
+    """The elite styles, and children of them to make up the population. Children are never duplicates: once
+    attempts children in a row are, the rest of the population is made up of random styles not in it yet."""
+    parents = [evaluation.style for evaluation in evaluations[:elite]]
+    styles = list(parents)
+    duplicates = 0
+    while len(styles) < population and duplicates < attempts:
+        child = mutate(crossover(*rng.sample(parents, 2), rng) if len(parents) > 1 else parents[0], rng)
+        if child in styles:
+            duplicates += 1
+        else:
+            styles.append(child)
+            duplicates = 0
+    if len(styles) < population:
+        unused = [style for style in map(Style._make, product(*PARAMETERS)) if style not in styles]
+        styles += rng.sample(unused, population - len(styles))
+    return styles
+
+
+def tune(generations=10, population=12, elite=4, games=200, seed=0, processes=None, max_turns=300, report=None):
+    """Runs the genetic search from the default style and random ones, returning the last generation's
+    Evaluations, best first. report, if given, is called with each generation's number and Evaluations."""
+    if not 0 < elite <= population <= STYLE_COUNT:
+        raise ValueError(f"The population must be between the elite and the {STYLE_COUNT} distinct styles.")
+    rng = random.Random(seed)
+    styles = [Style()]
+    while len(styles) < population:
+        style = random_style(rng)
+        if style not in styles:
+            styles.append(style)
+    pool = Pool(processes) if processes != 1 else None
+    try:
+        for generation in range(generations):
+            seeds = [evaluation_seed(seed, generation, game_number) for game_number in range(games)]
+            evaluations = evaluate(styles, seeds, pool, max_turns)
+            if report:
+                report(generation, evaluations)
+            if generation < generations - 1:
+                styles = next_generation(evaluations, population, elite, rng)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    return evaluations
+
+
+def save_styles(styles, path):
+    """Adds named styles to a JSON file of them."""
+    try:
+        with open(path) as styles_file:
+            saved = json.load(styles_file)
+    except FileNotFoundError:
+        saved = {}
+    saved.update((name, style._asdict()) for name, style in styles.items())
+    with open(path, "w") as styles_file:
+        json.dump(saved, styles_file, indent=2)
+        styles_file.write("\n")
+
+
+def load_styles(path):
+    """Adds the styles in a JSON file of them to main.STYLES, returning them."""
+    with open(path) as styles_file:
+        styles = {name: Style(**parameters) for name, parameters in json.load(styles_file).items()}
+    STYLES.update(styles)
+    return styles
+
+
+def print_generation(generation, evaluations):
+    best = evaluations[0]
+    print(f"generation {generation}: best {best.points / best.games:.1f} points and {best.wins / best.games:.0%} "
+          f"wins per round with {tuple(best.style)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the AI's playing style by a genetic search over self-play.")
+    parser.add_argument("--generations", type=int, default=10)
+    parser.add_argument("--population", type=int, default=12)
+    parser.add_argument("--elite", type=int, default=4)
+    parser.add_argument("--games", type=int, default=200, help="deals each candidate plays per generation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None, help="defaults to the number of cores")
+    parser.add_argument("--max-turns", type=int, default=300)
+    parser.add_argument("--save", metavar="PATH", help="add the best styles to this JSON file of named styles")
+    parser.add_argument("--name", default="tuned", help="the best style's name, the runners-up being numbered")
+    parser.add_argument("--keep", type=int, default=1, help="how many of the best styles to save")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    evaluations = tune(args.generations, args.population, args.elite, args.games, args.seed, args.processes,
+                       args.max_turns, report=print_generation)
+    print(f"\n{time.perf_counter() - start:.1f}s\n")
+    print(" ".join(f"{field:>15}" for field in Style._fields) + f" {'points':>8} {'wins':>6}")
+    for evaluation in evaluations:
+        print(" ".join(f"{value:15}" for value in evaluation.style)
+              + f" {evaluation.points / evaluation.games:8.1f} {evaluation.wins / evaluation.games:6.0%}")
+    if args.save:
+        styles = {args.name if rank == 0 else f"{args.name}-{rank + 1}": evaluation.style
+                  for rank, evaluation in enumerate(evaluations[:args.keep])}
+        save_styles(styles, args.save)
+        print(f"\nSaved {', '.join(styles)} to {args.save}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Batched victory condition checks over many hands at once, using NumPy.
+
+Hands are given either as an (N x 13) matrix of rank counts, or as N hands of card codes (see ``encode_cards``).
+Each batched check returns a boolean can-go-down vector of length N, and an (N x 13) boolean matrix of victory
+ranks, matching the scalar ``VictoryConditions`` functions exactly.
+
+Only the rounds whose contracts are three of a kinds alone (1 and 4) are batched, as rank counts decide them. The
+sequence rounds depend on suits and a search over which cards go into which sequence, so they're checked a hand at a
+time by ``VictoryConditions``.
+"""
+import numpy as np
+
+from src.main import CARD_RANKS, WILD_RANK
+
+CARD_RANK_ARRAY = np.frombuffer(CARD_RANKS, dtype=np.uint8)
+RANK_BITS = 1 << np.arange(13)
+
+
+def rank_count_matrix(hands):
+    """Builds the (N x 13) rank count matrix for N hands of card codes."""
+    lengths = np.fromiter((len(hand) for hand in hands), dtype=np.intp, count=len(hands))
+    codes = np.frombuffer(b"".join(hands), dtype=np.uint8)
+    rows = np.repeat(np.arange(len(hands)), lengths)
+    flat = np.bincount(rows * 13 + CARD_RANK_ARRAY[codes], minlength=len(hands) * 13)
+    return flat.reshape(len(hands), 13)
+
+
+def two_three_of_a_kind_batch(counts):
+    wild_counts = counts[:, WILD_RANK]
+    naturals = counts[:, 1:]
+    three_of_a_kinds = naturals >= 3
+    two_of_a_kinds = naturals >= 2
+    three_of_a_kind_counts = three_of_a_kinds.sum(axis=1)
+    two_of_a_kind_counts = two_of_a_kinds.sum(axis=1)
+    wild = wild_counts > 0
+
+    # one natural three of a kind, and one wild with a deuce (needs a pair that isn't also a three of a kind)
+    one_wild = wild & (three_of_a_kind_counts > 0) & (two_of_a_kinds & ~three_of_a_kinds).any(axis=1)
+    # two natural three of a kinds, with any wild cards left in the hand
+    both_natural = ~one_wild & (three_of_a_kind_counts >= 2)
+    # two wild three of a kinds with deuces
+    both_wild = wild & (three_of_a_kind_counts == 0) & (two_of_a_kind_counts >= 2) & (wild_counts >= 2)
+
+    with_wilds = one_wild | both_wild
+    victory_ranks = np.zeros(counts.shape, dtype=bool)
+    victory_ranks[:, WILD_RANK] = with_wilds
+    victory_ranks[:, 1:] = (three_of_a_kinds & both_natural[:, None]) | (two_of_a_kinds & with_wilds[:, None])
+    return both_natural | with_wilds, victory_ranks
+
+
+def highest(ranks, limits):
+    """Keeps the highest ranks set in each row of the boolean matrix, up to the row's limit."""
+    taken = np.cumsum(ranks[:, ::-1], axis=1)[:, ::-1]
+    return ranks & (taken <= limits[:, None])
+
+
+def three_three_of_a_kind_batch(counts):
+    """Mirrors main.choose_three_of_a_kinds: the highest natural three of a kinds, then the highest pairs made up
+    with a wild card each."""
+    wild_counts = counts[:, WILD_RANK]
+    naturals = counts[:, 1:]
+    three_of_a_kinds = naturals >= 3
+    pairs = naturals == 2
+    wilds_needed = np.maximum(3 - three_of_a_kinds.sum(axis=1), 0)
+    can_go_down = (pairs.sum(axis=1) >= wilds_needed) & (wild_counts >= wilds_needed)
+
+    victory_ranks = np.zeros(counts.shape, dtype=bool)
+    victory_ranks[:, WILD_RANK] = can_go_down & (wilds_needed > 0)
+    chosen = highest(three_of_a_kinds, np.full(len(counts), 3)) | highest(pairs, wilds_needed)
+    victory_ranks[:, 1:] = chosen & can_go_down[:, None]
+    return can_go_down, victory_ranks
+
+
+BATCH_VICTORY_CONDITIONS = {
+    1: two_three_of_a_kind_batch,
+    4: three_three_of_a_kind_batch,
+}
+
+
+def evaluate_round(round_number, hands):
+    """Checks a batch of hands (card code hands or a rank count matrix) against the given round's contract, one of
+    BATCH_VICTORY_CONDITIONS."""
+    func = BATCH_VICTORY_CONDITIONS.get(round_number)
+    if func is None:
+        raise ValueError(f"Round {round_number} has no batched victory condition.")
+    if isinstance(hands, np.ndarray):
+        counts = hands
+    else:
+        counts = rank_count_matrix(hands)
+    return func(counts)
+
+
+def victory_rank_bits(victory_ranks):
+    """Converts an (N x 13) victory rank matrix to the scalar functions' rank bitmasks."""
+    return victory_ranks.astype(np.int64) @ RANK_BITS